@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from FrameCache import FrameCache
+from ImageConverter import Converter, Device, Method
+from ImageLibrary import imageInfo
+
+logger = logging.getLogger(__name__)
+
+
+def bootId():
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as boot_id:
+            return boot_id.read().strip()
+    except OSError:
+        return None
+
+
+class PanelSession:
+    """
+    Panel state kept across runs, so the panel is only cleared on the first update after
+    boot, after clear_every refreshes to remove ghosting, or when explicitly requested.
+    """
+
+    def __init__(self, path=".panel_session", clear_every=10):
+        self.path = path
+        self.clear_every = clear_every
+        self.state = {"boot": None, "refreshes": 0, "clear": True}
+        try:
+            with open(path) as session:
+                self.state.update(json.load(session))
+        except (OSError, ValueError):
+            pass
+
+    def needsClear(self):
+        return (
+            self.state["clear"]
+            or self.state["boot"] != bootId()
+            or self.state["refreshes"] >= self.clear_every
+        )
+
+    def requestClear(self):
+        self.state["clear"] = True
+        self._store()
+
+    def cleared(self):
+        self.state.update(boot=bootId(), refreshes=0, clear=False)
+        self._store()
+
+    def refreshed(self):
+        self.state["refreshes"] += 1
+        self._store()
+
+    def _store(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as session:
+            json.dump(self.state, session)
+        os.replace(temporary, self.path)
+
+
+class WavesharePanel:
+    """The 7.3in 7 colour waveshare panel, fed with packed framebuffers."""
+
+    device = Device.WS7in
+
+    def __init__(self, saturation=0.5, method=Method.STEVENSON_ARCE, spi_speed=None, spi_validate=False,
+                 session=None, release=True, cache=None):
+        from waveshare_epd import epd7in3f
+
+        self.epdconfig = epd7in3f.epdconfig
+        self.epd = epd7in3f.EPD()
+        self.width = self.epd.width
+        self.height = self.epd.height
+        self.saturation = saturation
+        self.method = method
+        self.cache = cache
+        self.session = session if session is not None else PanelSession()
+        # keep SPI and GPIO open between images when not released after every refresh
+        self.release = release
+        self.epdconfig.spi_profile(speed_hz=spi_speed, validate=spi_validate)
+
+    def convert(self, image_path):
+        return Converter(
+            self.width, self.height, image_path, self.saturation, self.device, self.method, self.cache
+        ).framebuffer()
+
+    def wake(self):
+        logger.info("init")
+        self.epd.init()
+
+    def show(self, framebuffer):
+        # only clear once there is a frame to follow, a failed conversion leaves the panel as it is
+        if self.session.needsClear():
+            logger.info("Clear")
+            self.epd.Clear()
+            self.session.cleared()
+        logger.info("Drawing on the image...")
+        self.epd.display(framebuffer)
+        self.session.refreshed()
+
+    def requestClear(self):
+        self.session.requestClear()
+
+    def sleep(self):
+        logger.info("Goto Sleep...")
+        self.epd.sleep(self.release)
+
+    def exit(self):
+        self.epdconfig.module_exit()
+
+
+class InkyPanel:
+    """The 5.7in Inky Impression, fed with dithered palette images."""
+
+    device = Device.Inky
+
+    def __init__(self, saturation=0.5, method=Method.STEVENSON_ARCE, cache=None):
+        from inky.auto import InkyUC8159  # noqa: F401
+
+        self.inky = InkyUC8159(resolution=(600, 448))
+        self.width = self.inky.width
+        self.height = self.inky.height
+        self.saturation = saturation
+        self.method = method
+        self.cache = cache
+
+    def convert(self, image_path):
+        return Converter(
+            self.width, self.height, image_path, self.saturation, self.device, self.method, self.cache
+        ).convert()
+
+    def wake(self):
+        pass
+
+    def show(self, image):
+        self.inky.set_image(image)
+        self.inky.show()
+
+    def requestClear(self):
+        pass
+
+    def sleep(self):
+        pass
+
+    def exit(self):
+        pass
+
+
+def makePanel(device, saturation=0.5, method=Method.STEVENSON_ARCE, spi_speed=None, spi_validate=False,
+              clear=False, clear_every=10, release=True, cache_budget=64 << 20):
+    # a budget of 0 renders every image afresh
+    cache = FrameCache(budget=cache_budget) if cache_budget else None
+    if device == Device.Inky:
+        return InkyPanel(saturation, method, cache)
+    session = PanelSession(clear_every=clear_every)
+    if clear:
+        session.requestClear()
+    return WavesharePanel(saturation, method, spi_speed, spi_validate, session, release, cache)
+
+
+class DisplayPipeline:
+    """
+    Show images on a panel in submission order. Images are converted on a worker thread
+    ahead of the panel, so dithering the next image overlaps waking and refreshing the
+    panel for the current one.
+    """
+
+    def __init__(self, panel, lookahead=1):
+        self.panel = panel
+        self.converter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="convert")
+        # bounds the images converted but not yet shown
+        self.slots = threading.Semaphore(lookahead + 1)
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="display", daemon=True)
+        self.thread.start()
+
+    def submit(self, image_path):
+        """Queue an image, blocking while lookahead images are already waiting for the panel."""
+        self.slots.acquire()
+        self.pending.put((image_path, self.converter.submit(self.panel.convert, image_path)))
+
+    def close(self):
+        """Show every queued image, then stop the worker threads."""
+        self.pending.put(None)
+        self.thread.join()
+        self.converter.shutdown()
+
+    def _run(self):
+        while (job := self.pending.get()) is not None:
+            image_path, frame = job
+            try:
+                self.panel.wake()
+                try:
+                    self.panel.show(frame.result())
+                finally:
+                    self.panel.sleep()
+            except Exception:
+                logger.exception("Could not display %s" % image_path)
+            finally:
+                self.slots.release()
+
+
+class PreRenderer:
+    """
+    Render newly received images into the frame cache on a low priority background thread, so
+    showing them later only transfers and refreshes. An image is rendered once it has not been
+    written to for settle seconds, as uploads arrive in many writes. panel returns the panel to
+    render for, asked again for every image, as the settings of the frames shown may change.
+    """
+
+    def __init__(self, panel, settle=5):
+        self.panel = panel
+        self.settle = settle
+        # image path -> time after which it is rendered
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.alive = True
+        self.thread = threading.Thread(target=self._run, name="prerender", daemon=True)
+        self.thread.start()
+
+    def submit(self, image_path):
+        with self.condition:
+            self.pending[image_path] = time.monotonic() + self.settle
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.alive = False
+            self.condition.notify()
+        self.thread.join()
+
+    def _next(self):
+        with self.condition:
+            while self.alive:
+                now = time.monotonic()
+                ready = [path for path, deadline in self.pending.items() if deadline <= now]
+                if ready:
+                    del self.pending[ready[0]]
+                    return ready[0]
+                self.condition.wait(min(self.pending.values()) - now if self.pending else None)
+        return None
+
+    def _run(self):
+        try:
+            # the nice value of a linux thread only applies to itself and the processes it starts
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        while (image_path := self._next()) is not None:
+            # the same rule as the image library, which picks the images to show
+            if not os.path.isfile(image_path) or imageInfo(image_path) is None:
+                continue
+            try:
+                self.panel().convert(image_path)
+                logger.info("Pre-rendered %s" % image_path)
+            except Exception as e:
+                logger.info("Could not pre-render %s: %s" % (image_path, e))
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+from ImageConverter import Device, Method
+
+DEFAULT_SOCKET = "/tmp/framy_display.sock"
+
+logger = logging.getLogger(__name__)
+
+
+class Reply:
+    SENT = "sent"
+    # the service is running but did not take the image, it still owns the panel
+    REFUSED = "refused"
+    UNAVAILABLE = "unavailable"
+
+
+def _exchange(request, socket_path):
+    """Send one request to the display service and return its reply, None when none is listening."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except OSError:
+            return None
+        try:
+            connection.sendall(json.dumps(request).encode() + b"\n")
+            return json.loads(connection.makefile("rb").readline() or b"{}")
+        except (OSError, ValueError) as e:
+            return {"error": str(e)}
+
+
+def requestUpdate(image_path, clear=False, socket_path=DEFAULT_SOCKET):
+    """
+    Hand an image to a running display service. Only when no service is listening may the caller
+    fall back to driving the panel itself, a refusing service still holds SPI and GPIO.
+    """
+    reply = _exchange({"image": os.path.abspath(image_path), "clear": clear}, socket_path)
+    if reply is None:
+        return Reply.UNAVAILABLE
+    if not reply.get("ok"):
+        logger.warning("Display service refused %s: %s" % (image_path, reply.get("error", "no reply")))
+        return Reply.REFUSED
+    return Reply.SENT
+
+
+def requestSettings(socket_path=DEFAULT_SOCKET):
+    """The device, saturation and method a running display service renders with, or None."""
+    reply = _exchange({"settings": True}, socket_path)
+    if not reply or not reply.get("ok"):
+        return None
+    return reply["device"], reply["saturation"], reply["method"]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("settings"):
+                    # lets the watcher pre-render frames under the same cache key as this service
+                    panel = self.server.panel
+                    reply = {"ok": True, "device": panel.device, "saturation": panel.saturation,
+                             "method": panel.method}
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+                    continue
+                image_path = request["image"]
+                if not os.path.isfile(image_path):
+                    raise ValueError("no such image %s" % image_path)
+                if request.get("clear"):
+                    self.server.panel.requestClear()
+                self.server.pipeline.submit(image_path)
+                reply = {"ok": True}
+            except (KeyError, TypeError, ValueError) as e:
+                reply = {"ok": False, "error": str(e)}
+            except Exception as e:
+                # e.g. the panel session could not be stored, the client must not take over the panel
+                logger.exception("Could not queue %s" % line)
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class DisplayService(socketserver.ThreadingUnixStreamServer):
+    """
+    Owns the panel driver and its SPI and GPIO handles for the lifetime of the process, and
+    queues the images sent over a unix socket on a single display pipeline.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, panel, socket_path=DEFAULT_SOCKET):
+        from DisplayPipeline import DisplayPipeline
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, RequestHandler)
+        self.socket_path = socket_path
+        self.panel = panel
+        self.pipeline = DisplayPipeline(panel)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.pipeline.close()
+        self.panel.exit()
+
+
+def restricted_float(x):
+    try:
+        x = float(x)
+    except ValueError:
+        raise argparse.ArgumentTypeError("%r not a floating-point literal" % (x,))
+
+    if x < 0.0 or x > 1.0:
+        raise argparse.ArgumentTypeError("%r not in range [0.0, 1.0]" % (x,))
+    return x
+
+
+def main():
+    from DisplayPipeline import makePanel
+
+    parser = argparse.ArgumentParser(
+        prog="Framy display service",
+        description="Keeps the panel initialised and shows the images it is sent!",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="path",
+        help="Unix socket to accept update requests on",
+        default=DEFAULT_SOCKET,
+    )
+    parser.add_argument(
+        "-d",
+        "--device",
+        metavar="string",
+        choices=[Device.WS7in, Device.Inky],
+        help="Device type",
+        default=Device.WS7in,
+    )
+    parser.add_argument(
+        "-s",
+        "--saturation",
+        metavar="float",
+        type=restricted_float,
+        help="Image saturation (0.0-1.0)",
+        default=0.5,
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        metavar="string",
+        choices=Method.ALL,
+        help="Error diffusion method",
+        default=Method.STEVENSON_ARCE,
+    )
+    parser.add_argument(
+        "--spi-speed",
+        metavar="hz",
+        type=int,
+        help="SPI clock of the panel, defaults to the driver profile",
+        default=None,
+    )
+    parser.add_argument(
+        "--spi-validate",
+        action="store_true",
+        help="Check a raised SPI clock with a MOSI-MISO loopback first",
+    )
+    parser.add_argument(
+        "--clear-every",
+        metavar="n",
+        type=int,
+        help="Clear the panel after this many image refreshes to remove ghosting",
+        default=10,
+    )
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        type=int,
+        help="Disk space for rendered frames, 0 disables the frame cache",
+        default=64,
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG)
+    panel = makePanel(
+        args.device,
+        args.saturation,
+        args.method,
+        args.spi_speed,
+        args.spi_validate,
+        clear_every=args.clear_every,
+        release=False,
+        cache_budget=args.cache_size << 20,
+    )
+    # stop cleanly on systemd or screen shutdown as well as ctrl + c
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with DisplayService(panel, args.socket) as service:
+        logger.info("Listening on %s" % args.socket)
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("ctrl + c:")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# part of every frame key, bump it with any change to the dither engine, its palettes or the frame
+# formats, so frames rendered before the upgrade are no longer served and age out of the cache
+RENDER_VERSION = 1
+
+
+def fileDigest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        while chunk := source.read(1 << 16):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """
+    Rendered frames on disk, addressed by the hash of the source image and the render settings,
+    so showing an image again skips resizing and dithering. The least recently used frames are
+    evicted once the cache grows beyond budget bytes.
+    """
+
+    def __init__(self, path=".frame_cache", budget=64 << 20):
+        self.path = path
+        self.budget = budget
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, image_path, kind, device, resolution, saturation, method):
+        settings = "%d-%s-%s-%dx%d-%s-%s" % (RENDER_VERSION, kind, device, *resolution, saturation, method)
+        return hashlib.sha256((fileDigest(image_path) + settings).encode()).hexdigest()
+
+    def get(self, key):
+        entry = os.path.join(self.path, key)
+        try:
+            with open(entry, "rb") as frame:
+                data = frame.read()
+            # the modification time orders the entries for eviction
+            os.utime(entry)
+        except OSError:
+            return None
+        logger.debug("Frame cache hit %s" % key)
+        return data
+
+    @contextlib.contextmanager
+    def rendering(self, key):
+        """
+        Hold the render of a frame, so other threads and processes sharing the cache wait for it
+        instead of rendering the same frame again.
+        """
+        with open(os.path.join(self.path, key + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def put(self, key, data):
+        descriptor, temporary = tempfile.mkstemp(prefix=key, suffix=".tmp", dir=self.path)
+        with os.fdopen(descriptor, "wb") as frame:
+            frame.write(data)
+        os.replace(temporary, os.path.join(self.path, key))
+        self._evict()
+
+    def _evict(self):
+        frames = []
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if "." in entry.name:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another render in the meantime
+                    continue
+                frames.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        size = sum(frame_size for _, frame_size, _ in frames)
+        for _, frame_size, path in sorted(frames):
+            if size <= self.budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            with contextlib.suppress(OSError):
+                os.remove(path + ".lock")
+            logger.debug("Frame cache evicted %s" % path)
+            size -= frame_size
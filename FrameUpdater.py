@@ -2,13 +2,14 @@
 # -*- coding:utf-8 -*-
 import logging
 import argparse
-from ImageConverter import Converter, Device
+from ImageConverter import Device, Method
+from DisplayPipeline import DisplayPipeline, makePanel
+from DisplayService import DEFAULT_SOCKET, Reply, requestUpdate
 import os
 from os.path import join, isfile
 import shutil
-import filetype
 import sys
-import numpy as np
+from ImageLibrary import ImageLibrary
 
 
 def restricted_float(x):
@@ -48,7 +49,53 @@ parser.add_argument(
     help="Image saturation (0.0-1.0)",
     default=0.5,
 )
+parser.add_argument(
+    "-m",
+    "--method",
+    metavar="string",
+    choices=Method.ALL,
+    help="Error diffusion method",
+    default=Method.STEVENSON_ARCE,
+)
+parser.add_argument(
+    "--spi-speed",
+    metavar="hz",
+    type=int,
+    help="SPI clock of the panel, defaults to the driver profile",
+    default=None,
+)
+parser.add_argument(
+    "--spi-validate",
+    action="store_true",
+    help="Check a raised SPI clock with a MOSI-MISO loopback first",
+)
+parser.add_argument(
+    "--clear",
+    action="store_true",
+    help="Clear the panel before the next image",
+)
+parser.add_argument(
+    "--clear-every",
+    metavar="n",
+    type=int,
+    help="Clear the panel after this many image refreshes to remove ghosting",
+    default=10,
+)
+parser.add_argument(
+    "--cache-size",
+    metavar="MB",
+    type=int,
+    help="Disk space for rendered frames, 0 disables the frame cache",
+    default=64,
+)
+parser.add_argument(
+    "--socket",
+    metavar="path",
+    help="Display service socket, used instead of driving the panel when it is running",
+    default=DEFAULT_SOCKET,
+)
 args = parser.parse_args()
+library = ImageLibrary()
 
 
 def clearStatic():
@@ -64,74 +111,41 @@ def clearStatic():
 
 
 def updateImage(img):
+    reply = requestUpdate(img, args.clear, args.socket)
+    if reply == Reply.SENT:
+        logging.info("Sent %s to the display service" % img)
+        exit(0)
+    if reply == Reply.REFUSED:
+        # keep the update markers, the service owns the panel
+        exit(1)
     try:
-        if args.device == Device.WS7in or args.device == DEVICES[-1]:
-            try:
-                from waveshare_epd import epd7in3f
-
-                logging.info("epd7in3f Demo")
-                epd = epd7in3f.EPD()
-                Himage = Converter(
-                    epd.width, epd.height, img, args.saturation, Device.WS7in
-                ).convert()
-                logging.info("init and Clear")
-                epd.init()
-                epd.Clear()
-                # Drawing on the image
-                logging.info("1.Drawing on the image...")
-                epd.display(epd.getbuffer(Himage))
-                logging.info("Goto Sleep...")
-                epd.sleep()
-            except KeyboardInterrupt:
-                logging.info("ctrl + c:")
-                epd7in3f.epdconfig.module_exit()
-            exit(0)
-        elif args.device == Device.Inky or args.device == DEVICES[-1]:
-            try:
-                from inky.auto import InkyUC8159  # noqa: F401
-
-                inky = InkyUC8159(resolution=(600, 448))
-                Himage = Converter(
-                    inky.width, inky.height, img, args.saturation, Device.Inky
-                ).convert()
-                inky.set_image(Himage)
-                inky.show()
-                exit(0)
-            except Exception as e:
-                raise (e)
+        panel = makePanel(
+            args.device,
+            args.saturation,
+            args.method,
+            args.spi_speed,
+            args.spi_validate,
+            args.clear,
+            args.clear_every,
+            cache_budget=args.cache_size << 20,
+        )
+        pipeline = DisplayPipeline(panel)
+        try:
+            pipeline.submit(img)
+            pipeline.close()
+        except KeyboardInterrupt:
+            logging.info("ctrl + c:")
+            panel.exit()
+        exit(0)
     except IOError as e:
         logging.info(e)
 
 
 def getFirstImage(folder, random=False):
-    first_img = next(
-        (
-            f
-            for f in os.listdir(folder)
-            if isfile(join(folder, f)) and filetype.is_image(join(folder, f))
-        ),
-        None,
-    )
-    random_file = None
-    if random:
-        file_count = len(
-            [
-                name
-                for name in os.listdir(folder)
-                if os.path.isfile(os.path.join(folder, name))
-            ]
-        )
-        random_file = next(
-            (
-                f
-                for f in os.listdir(folder)
-                if isfile(join(folder, f))
-                and filetype.is_image(join(folder, f))
-                and np.random.rand() < 1.0 / file_count
-            ),
-            None,
-        )
-    return random_file if random_file else first_img
+    # only files added or changed since the last run are read
+    library.reconcile(folder)
+    image_path = library.shuffled(folder) if random else library.first(folder)
+    return os.path.basename(image_path) if image_path else None
 
 
 def updateImageFolder(folder, random=False):
@@ -7,8 +7,58 @@ import logging
 import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+import errno
 import filecmp
-import shlex
+import shutil
+
+
+def copyFile(source, target):
+    """Copy inside the kernel, as a reflink where the file system supports it, else through sendfile."""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            return
+        except (AttributeError, OSError):
+            pass
+    # copy_file_range is missing or refuses these file systems
+    shutil.copyfile(source, target)
+
+
+def moveFile(source, target):
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # across file systems, directories like static/ are copied file by file
+        shutil.move(source, target, copy_function=copyFile)
+
+
+def runOperations(operations):
+    """
+    Execute queued ("cp", source, target), ("mv", source, target) and ("rm", target) operations
+    in process. Only the last operation queued for a target is executed.
+    """
+    last = {}
+    for operation in operations:
+        last.pop(operation[-1], None)
+        last[operation[-1]] = operation
+    for operation in last.values():
+        try:
+            if operation[0] == "cp":
+                copyFile(operation[1], operation[2])
+            elif operation[0] == "mv":
+                moveFile(operation[1], operation[2])
+            elif operation[0] == "rm":
+                os.remove(operation[1])
+            print(" ".join(operation) + " executed!")
+        except OSError as e:
+            print(" ".join(operation) + " failed: " + str(e))
 
 
 class FileModified:
@@ -21,11 +71,16 @@ class FileModified:
         self.modified = True
         if self.storeop:
             if fileop not in self.operations:
-                print(fileop + " : will be executed on replug!")
+                print(" ".join(fileop) + " : will be executed on replug!")
                 self.operations.append(fileop)
         else:
-            os.system(fileop)
-            print(fileop + " executed!")
+            runOperations([fileop])
+
+    def reset(self):
+        """Forget the changes seen so far and return the operations still to be executed."""
+        operations, self.operations = self.operations, []
+        self.modified = False
+        return operations
 
 
 def sameFiles(path_a, path_b):
@@ -35,7 +90,7 @@ def sameFiles(path_a, path_b):
 
 class Handler(FileSystemEventHandler):
     def __init__(self, source: str, target: str, actionLock: threading.Lock, changed: FileModified,
-                 largeFileLock=None):
+                 largeFileLock=None, prerender=None, library=None):
         self.source = source
         self.target = target
         self.fsLock = actionLock
@@ -45,7 +100,12 @@ class Handler(FileSystemEventHandler):
         self.timeout_lock = largeFileLock
         self.timeout_start = datetime.datetime.now()
         self.received = []
-        
+        self.prerender = prerender
+        self.library = library
+        # counts the events seen, so waiters wake on the next event instead of polling
+        self.activity = threading.Condition()
+        self.events = 0
+
     def start(self):
         self.observer.schedule(self, path=self.source, recursive=True)
         self.observer.start()
@@ -53,10 +113,27 @@ class Handler(FileSystemEventHandler):
     def stop(self):
         self.alive = False
         self.observer.stop()
+        self.notify_event()
 
     def join(self):
         self.observer.join()
 
+    def reset(self):
+        """Start a new quiet period with no pending changes, keeping the observer running."""
+        with self.fsLock:
+            self.timeout_start = datetime.datetime.now()
+            return self.changed.reset()
+
+    def notify_event(self):
+        with self.activity:
+            self.events += 1
+            self.activity.notify_all()
+
+    def wait_event(self, seen, timeout=None):
+        """Block until an event after the first seen ones arrives, the handler stops or timeout seconds pass."""
+        with self.activity:
+            return self.activity.wait_for(lambda: self.events != seen or not self.alive, timeout)
+
     def init_timeout(self):
         if not self.fsLock:
             return
@@ -68,11 +145,13 @@ class Handler(FileSystemEventHandler):
     def handle_file(self, src_path):
         print(f"Received {src_path}")
         self.fsLock.acquire()
+        moves = []
         for file in os.listdir(self.target):
-            if os.path.join(self.target, file) != src_path:
-                path = os.path.join(self.target, file.replace(" ", "\ "))
+            path = os.path.join(self.target, file)
+            if path != src_path:
                 print(f"moving: {path} to {self.source}")
-                os.system(f"mv {path} {self.source}")
+                moves.append(("mv", path, os.path.join(self.source, file)))
+        runOperations(moves)
 
         print("waiting for timeout")
         timeout_after = 5
@@ -95,17 +174,38 @@ class Handler(FileSystemEventHandler):
         self.received.remove(src_path)
         self.fsLock.release()
 
+    def update_library(self, event):
+        if event.is_directory:
+            # the files of a folder moved or deleted as a whole may get no events of their own
+            if event.event_type == "moved":
+                self.library.move(event.src_path, event.dest_path)
+            elif event.event_type == "deleted":
+                self.library.remove(event.src_path)
+        elif event.event_type in ("created", "closed"):
+            self.library.update(event.src_path)
+        elif event.event_type == "moved":
+            self.library.remove(event.src_path)
+            self.library.update(event.dest_path)
+        elif event.event_type == "deleted":
+            self.library.remove(event.src_path)
+
     def on_any_event(self, event):
+        if self.library:
+            self.update_library(event)
         if not event.is_directory:
             print(event.event_type)
+            # every write postpones rendering the upload until it is complete
+            if self.prerender and event.event_type in ("created", "modified", "moved", "closed"):
+                self.prerender.submit(event.dest_path if event.event_type == "moved" else event.src_path)
             if (
                 event.event_type == "moved"
                 or event.event_type == "created"
                 or event.event_type == "modified"
+                and self.target is not None
                 and self.target in event.src_path
             ):
                 self.init_timeout()
-                if event.event_type == "created":
+                if event.event_type == "created" and self.target:
                     self.fsLock.acquire()
                     if event.src_path in self.received:
                         return self.fsLock.release()
@@ -116,13 +216,16 @@ class Handler(FileSystemEventHandler):
                     )
                     thrd.start()
 
+                self.fsLock.acquire()
+                file = event.src_path.replace(self.source, "")
                 if self.target:
                     target = self.target + file
                     if self.changed:
-                        self.changed.modify("cp " + shlex.quote(event.src_path) + " " + shlex.quote(target))
+                        self.changed.modify(("cp", event.src_path, target))
                 else:
                     self.changed.modified = True
                 self.fsLock.release()
+                self.notify_event()
             elif event.event_type == 'deleted':
                 self.fsLock.acquire()
                 file = event.src_path.replace(self.source, "")
@@ -130,9 +233,10 @@ class Handler(FileSystemEventHandler):
                     target = self.target + file
                     if os.path.exists(target):
                         if self.changed:
-                            self.changed.modify("rm " + shlex.quote(target))
+                            self.changed.modify(("rm", target))
                     else:
                         print("Target file: " + target + " not found!")
                 else:
                     self.changed.modified = True
                 self.fsLock.release()
+                self.notify_event()
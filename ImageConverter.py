@@ -1,78 +1,123 @@
-import hitherdither
 from PIL import Image
+import io
+import os
 import subprocess
+import tempfile
 import numpy
 
+try:
+    import framy_dither
+except ImportError:
+    framy_dither = None
+
 class Device:
     WS7in = "WS7in"
     Inky = "Inky"
     Unknown = "unknown"
-class Converter:
-    
-    DESATURATED_PALETTE = [
-        [0, 0, 0],
-        [255, 255, 255],
-        [0, 255, 0],
-        [0, 0, 255],
-        [255, 0, 0],
-        [255, 255, 0],
-        [255, 140, 0],
-        [255, 255, 255],
-    ]
 
-    SATURATED_PALETTE = [
-        [57, 48, 57],
-        [255, 255, 255],
-        [58, 91, 70],
-        [61, 59, 94],
-        [156, 72, 75],
-        [208, 190, 71],
-        [177, 106, 73],
-        [255, 255, 255],
-    ]
 
-    def __init__(self, width, height, image, saturation=0.5, device=Device.WS7in) -> None:
+class Method:
+    FLOYD_STEINBERG = "floyd-steinberg"
+    JARVIS_JUDICE_NINKE = "jarvis-judice-ninke"
+    STUCKI = "stucki"
+    BURKES = "burkes"
+    SIERRA = "sierra"
+    SIERRA_2 = "sierra-2"
+    SIERRA_3 = "sierra-3"
+    ATKINSON = "atkinson"
+    STEVENSON_ARCE = "stevenson-arce"
+    ALL = [FLOYD_STEINBERG, JARVIS_JUDICE_NINKE, STUCKI, BURKES, SIERRA, SIERRA_2, SIERRA_3, ATKINSON, STEVENSON_ARCE]
+
+
+class Converter:
+    
+    def __init__(self, width, height, image, saturation=0.5, device=Device.WS7in,
+                 method=Method.STEVENSON_ARCE, cache=None) -> None:
         self.device = device
         self.resolution = (width, height)
         self.image = image
         self.saturation = saturation
+        self.method = method
+        self.cache = cache
         pass
 
-    def _palette_blend(self, dtype="uint8"):
-        palette = []
-        for i in range(7):
-            rs, gs, bs = [c * self.saturation for c in self.SATURATED_PALETTE[i]]
-            rd, gd, bd = [
-                c * (1.0 - self.saturation) for c in self.DESATURATED_PALETTE[i]
-            ]
-            if dtype == "uint8":
-                palette += [int(rs + rd), int(gs + gd), int(bs + bd)]
-            if dtype == "uint24":
-                palette += [(int(rs + rd) << 16) | (int(gs + gd) << 8) | int(bs + bd)]
-        if dtype == "uint8":
-            palette += [255, 255, 255]
-        if dtype == "uint24":
-            palette += [0xFFFFFF]
-        return palette
+    # panel colour order of the dither engine palette, as RGB
+    PANEL_PALETTE = [
+        0, 0, 0,
+        255, 255, 255,
+        0, 255, 0,
+        0, 0, 255,
+        255, 0, 0,
+        255, 255, 0,
+        255, 128, 0,
+    ]
+
+    def _resized(self):
+        return Image.open(self.image).convert("RGB").resize(self.resolution)
+
+    def _cached(self, kind, render):
+        """Return the rendered bytes from the frame cache, rendering and storing them on a miss."""
+        if self.cache is None:
+            return render()
+        key = self.cache.key(self.image, kind, self.device, self.resolution, self.saturation, self.method)
+        data = self.cache.get(key)
+        if data is None:
+            # a pre-render of the same frame may still be running, wait for it instead of rendering twice
+            with self.cache.rendering(key):
+                data = self.cache.get(key)
+                if data is None:
+                    data = render()
+                    self.cache.put(key, data)
+        return data
+
+    def framebuffer(self):
+        """Dither the image straight to the 4 bit packed buffer sent to the 7 colour panels."""
+        return self._cached("framebuffer", self._framebuffer)
+
+    def _framebuffer(self):
+        image = self._resized()
+        if framy_dither is None:
+            # renders may run concurrently, so each one works in a directory of its own
+            with tempfile.TemporaryDirectory() as directory:
+                converted = os.path.join(directory, "converted.png")
+                output = os.path.join(directory, "framebuffer.bin")
+                image.save(converted, "PNG")
+                subprocess.run(["./dither", "--method", self.method, "--saturation", str(self.saturation),
+                                "--format", "packed", converted, output], check=True)
+                with open(output, "rb") as framebuffer:
+                    return framebuffer.read()
+        indices = framy_dither.dither(numpy.asarray(image), method=self.method, saturation=self.saturation)
+        return framy_dither.pack(indices)
 
     def convert(self):
-        Image.open(self.image).resize(self.resolution).save("converted.png", "PNG")
-        subprocess.run(["./dither", "converted.png", "dithered.png"])
-        return Image.open("dithered.png")
-        #return Image.fromarray(numpy.array(Image.open("dithered.png"))[:,:,::-1])
-
-
-    #def convert(self):
-    #    # Image size doesn't matter since it's just the palette we're using
-    #    # Set our 7 colour palette (+ clear) and zero out the other 247 colours
-    #    pallet_blend_waveshare =[0,0,0,  255,255,255,  0,255,0,   0,0,255,  255,0,0,  255,255,0, 255,128,0] + [0,0,0]*249
-    #    image_7color = Image.open(self.image).convert("RGB").resize(self.resolution)
-    #    # Force source image data to be loaded for `.im` to work
-    #    palette = hitherdither.palette.Palette(self._palette_blend("uint24"))
-    #    image_dithered = hitherdither.diffusion.error_diffusion_dithering(image_7color, palette, method="stucki", order=3)
-    #    if self.device == Device.WS7in:
-    #        image_dithered.putpalette(pallet_blend_waveshare)
-    #    return image_dithered
+        if self.cache is None:
+            return self._convert()
+        return Image.open(io.BytesIO(self._cached("image", self._convert_png)))
+
+    def _convert_png(self):
+        encoded = io.BytesIO()
+        self._convert().save(encoded, "PNG")
+        return encoded.getvalue()
+
+    def _convert(self):
+        image = self._resized()
+        if framy_dither is None:
+            # fall back to the dither executable if the python module was not built
+            with tempfile.TemporaryDirectory() as directory:
+                converted = os.path.join(directory, "converted.png")
+                output = os.path.join(directory, "indices.bin")
+                image.save(converted, "PNG")
+                # the palette indices, so both paths give the same image in the panel colours
+                subprocess.run(["./dither", "--method", self.method, "--saturation", str(self.saturation),
+                                "--format", "raw", converted, output], check=True)
+                width, height = self.resolution
+                indices = numpy.fromfile(output, dtype=numpy.uint8).reshape(height, width)
+        else:
+            indices = framy_dither.dither(numpy.asarray(image), method=self.method, saturation=self.saturation)
+        dithered = Image.fromarray(indices, "P")
+        dithered.putpalette(self.PANEL_PALETTE)
+        return dithered
+
 
 if __name__ == "__main__":
     path =  "a colonized moon with rings, digital art.png"
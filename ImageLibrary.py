@@ -0,0 +1,198 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+
+from PIL import Image
+
+from FrameCache import fileDigest
+
+logger = logging.getLogger(__name__)
+
+
+def imageInfo(path):
+    """Return the PIL format, width and height of an image, or None for files PIL cannot open."""
+    try:
+        with Image.open(path) as image:
+            return (image.format, *image.size)
+    except Exception:
+        return None
+
+
+class ImageLibrary:
+    """
+    Persistent index of the files in the image folders with their size, modification time, image
+    type, dimensions and content hash. Files that are not images are kept with an empty type, so
+    they are not sniffed again until they change. The index is reconciled with a folder listing at
+    startup and kept current from watcher events, so picking an image is a query instead of
+    listing and reading the folder.
+    """
+
+    def __init__(self, path=".image_library.db"):
+        self.lock = threading.Lock()
+        # shared by the watcher threads, serialised by the lock
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS images (path TEXT PRIMARY KEY, folder TEXT NOT NULL, "
+                "size INTEGER, mtime_ns INTEGER, type TEXT, width INTEGER, height INTEGER, hash TEXT)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS images_folder ON images (folder, mtime_ns)")
+            # the images of a folder not shown yet in this round, in order of a random position
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS bag (path TEXT PRIMARY KEY, folder TEXT NOT NULL, position INTEGER)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS bag_folder ON bag (folder, position)")
+            # the image of a folder taken last, kept from opening the next round
+            self.connection.execute("CREATE TABLE IF NOT EXISTS shown (folder TEXT PRIMARY KEY, path TEXT)")
+
+    def close(self):
+        self.connection.close()
+
+    def _describe(self, path, stat):
+        image_type, width, height = imageInfo(path) or (None, None, None)
+        digest = None
+        if image_type is not None:
+            try:
+                digest = fileDigest(path)
+            except OSError:
+                image_type, width, height = None, None, None
+        folder = os.path.dirname(os.path.abspath(path))
+        return os.path.abspath(path), folder, stat.st_size, stat.st_mtime_ns, image_type, width, height, digest
+
+    def _store(self, rows):
+        with self.lock, self.connection:
+            added = [
+                (row[0], row[1]) for row in rows if row[4] is not None and self.connection.execute(
+                    "SELECT 1 FROM images WHERE path = ? AND type IS NOT NULL", (row[0],)
+                ).fetchone() is None
+            ]
+            # a finished round starts over with the whole folder, so the new images are not shown twice
+            for folder in {folder for _, folder in added}:
+                if self.connection.execute("SELECT 1 FROM bag WHERE folder = ?", (folder,)).fetchone() is None:
+                    self._refill(folder)
+            # new images join the current round at a random position, changed ones keep theirs
+            self.connection.executemany("INSERT OR IGNORE INTO bag VALUES (?, ?, random())", added)
+            self.connection.executemany(
+                "DELETE FROM bag WHERE path = ?", [(row[0],) for row in rows if row[4] is None]
+            )
+            self.connection.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _refill(self, folder):
+        """Start a new round with every image of the folder, called with the lock held."""
+        self.connection.execute(
+            "INSERT INTO bag SELECT path, folder, random() FROM images WHERE folder = ? AND type IS NOT NULL",
+            (folder,),
+        )
+        rows = self.connection.execute(
+            "SELECT path, position FROM bag WHERE folder = ? ORDER BY position", (folder,)
+        ).fetchall()
+        last = self.connection.execute("SELECT path FROM shown WHERE folder = ?", (folder,)).fetchone()
+        if len(rows) > 1 and last is not None and rows[0][0] == last[0]:
+            # swap the last image of the previous round with another one, so it is not shown twice in a row
+            (first, first_position), (other, other_position) = rows[0], rows[random.randrange(1, len(rows))]
+            self.connection.executemany(
+                "UPDATE bag SET position = ? WHERE path = ?", [(other_position, first), (first_position, other)]
+            )
+
+    def update(self, path):
+        """Index a new or changed file, or drop it from the index if it is gone."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return self.remove(path)
+        if not os.path.isfile(path):
+            return
+        self._store([self._describe(path, stat)])
+
+    def remove(self, path):
+        """Drop a file, or a folder with every file below it, from the index."""
+        path = os.path.abspath(path)
+        prefix = path + os.sep
+        with self.lock, self.connection:
+            for table in ("images", "bag"):
+                self.connection.execute(
+                    "DELETE FROM %s WHERE path = ? OR folder = ? OR substr(folder, 1, ?) = ?" % table,
+                    (path, path, len(prefix), prefix),
+                )
+
+    def move(self, source, destination):
+        """Follow a folder moved within the watched folders, keeping what is known about its files."""
+        source, destination = os.path.abspath(source), os.path.abspath(destination)
+        prefix = source + os.sep
+        with self.lock, self.connection:
+            for table in ("images", "bag"):
+                self.connection.execute(
+                    "UPDATE OR REPLACE %s SET path = ? || substr(path, ?), folder = ? || substr(folder, ?) "
+                    "WHERE folder = ? OR substr(folder, 1, ?) = ?" % table,
+                    (destination, len(source) + 1, destination, len(source) + 1, source, len(prefix), prefix),
+                )
+
+    def _remove(self, paths):
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in paths])
+            self.connection.executemany("DELETE FROM bag WHERE path = ?", [(path,) for path in paths])
+
+    def reconcile(self, folder):
+        """Bring the index of a folder in line with its listing, only reading new or changed files."""
+        folder = os.path.abspath(folder)
+        with self.lock:
+            known = {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in self.connection.execute(
+                    "SELECT path, size, mtime_ns FROM images WHERE folder = ?", (folder,)
+                )
+            }
+        changed = []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if known.pop(entry.path, None) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append(self._describe(entry.path, stat))
+        self._store(changed)
+        self._remove(known)
+        logger.debug("Indexed %d changed and removed %d files in %s" % (len(changed), len(known), folder))
+
+    def _pick(self, folder, order):
+        while True:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT path FROM images WHERE folder = ? AND type IS NOT NULL ORDER BY " + order + " LIMIT 1",
+                    (os.path.abspath(folder),),
+                ).fetchone()
+            if row is None or os.path.isfile(row[0]):
+                return row[0] if row else None
+            # gone without an event reaching the index, e.g. while not watching
+            self._remove([row[0]])
+
+    def first(self, folder):
+        return self._pick(folder, "path")
+
+    def latest(self, folder):
+        return self._pick(folder, "mtime_ns DESC")
+
+    def shuffled(self, folder):
+        """
+        Take the next image of a shuffled playlist, persisted across runs. No image repeats until
+        every image of the folder has been shown, then a new round starts in a new order that does
+        not open with the image shown last.
+        """
+        folder = os.path.abspath(folder)
+        select = "SELECT path FROM bag WHERE folder = ? ORDER BY position LIMIT 1"
+        while True:
+            with self.lock, self.connection:
+                row = self.connection.execute(select, (folder,)).fetchone()
+                if row is None:
+                    self._refill(folder)
+                    row = self.connection.execute(select, (folder,)).fetchone()
+                if row is None:
+                    return None
+                self.connection.execute("DELETE FROM bag WHERE path = ?", row)
+                self.connection.execute("INSERT OR REPLACE INTO shown VALUES (?, ?)", (folder, row[0]))
+            if os.path.isfile(row[0]):
+                return row[0]
+            # gone without an event reaching the index, take the next one of the round
+            self._remove([row[0]])
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""
+Measures how long the file watcher is blind after an update: the time from dropping a file
+until a second dropped file is seen again, once with the in-process reset of check_fs_framy
+and once with the former re-exec of the watcher process. The panel update itself is left out.
+"""
+import argparse
+import contextlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from Handler import Handler, FileModified
+
+WATCHER = """
+import os, sys, threading, time
+from Handler import Handler, FileModified
+sys.stdout = open(os.devnull, "w")
+changed = FileModified(storeop=True)
+handler = Handler(source=sys.argv[1], target=None, actionLock=threading.Lock(), changed=changed,
+                  largeFileLock=threading.Lock())
+handler.start()
+print("watching", file=sys.__stdout__, flush=True)
+while not changed.modified:
+    time.sleep(0.001)
+print("seen", file=sys.__stdout__, flush=True)
+handler.stop()
+"""
+
+
+def waitFor(condition, timeout=10):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("the watcher did not see the dropped file")
+        time.sleep(0.001)
+
+
+def expect(watcher, marker):
+    if watcher.stdout.readline().strip() != marker:
+        raise RuntimeError("the watcher exited before printing " + marker)
+
+
+def dropFile(folder, name):
+    with open(os.path.join(folder, name), "wb") as image:
+        image.write(os.urandom(1024))
+
+
+def inProcess(folder, runs):
+    changed = FileModified(storeop=True)
+    handler = Handler(source=folder, target=None, actionLock=threading.Lock(), changed=changed,
+                      largeFileLock=threading.Lock())
+    handler.start()
+    times = []
+    for run in range(runs):
+        start = time.perf_counter()
+        dropFile(folder, "first%d.png" % run)
+        waitFor(lambda: changed.modified)
+        handler.reset()
+        dropFile(folder, "second%d.png" % run)
+        waitFor(lambda: changed.modified)
+        times.append(time.perf_counter() - start)
+        handler.reset()
+    handler.stop()
+    handler.join()
+    return times
+
+
+def reExec(folder, runs):
+    changed = FileModified(storeop=True)
+    handler = Handler(source=folder, target=None, actionLock=threading.Lock(), changed=changed,
+                      largeFileLock=threading.Lock())
+    handler.start()
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for run in range(runs):
+        start = time.perf_counter()
+        dropFile(folder, "first%d.png" % run)
+        waitFor(lambda: changed.modified)
+        handler.reset()
+        watcher = subprocess.Popen(
+            [sys.executable, "-c", WATCHER, folder], cwd=here, stdout=subprocess.PIPE, text=True
+        )
+        expect(watcher, "watching")
+        dropFile(folder, "second%d.png" % run)
+        expect(watcher, "seen")
+        times.append(time.perf_counter() - start)
+        watcher.wait()
+    handler.stop()
+    handler.join()
+    return times
+
+
+def report(name, times):
+    times = sorted(times)
+    print("%-12s median %7.1f ms  max %7.1f ms" % (name, 1000 * times[len(times) // 2], 1000 * times[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="Framy watcher benchmark",
+        description="Time from a dropped file until the watcher sees the next one!",
+    )
+    parser.add_argument("-n", "--runs", metavar="n", type=int, help="Drops per variant", default=20)
+    parser.add_argument(
+        "-t", "--timeout", metavar="s", type=int,
+        help="Watcher timeout, the re-exec also slept half of it before watching", default=10,
+    )
+    args = parser.parse_args()
+
+    # silence the event log of the handlers while measuring
+    with open(os.devnull, "w") as quiet:
+        with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(quiet):
+            in_process = inProcess(folder, args.runs)
+        with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(quiet):
+            re_exec = reExec(folder, args.runs)
+    report("in-process", in_process)
+    report("re-exec", re_exec)
+    print("the re-exec additionally slept %.1f s and checked obex before watching again" % (args.timeout / 2))
+
+
+if __name__ == "__main__":
+    main()
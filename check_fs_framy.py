@@ -3,9 +3,12 @@ import os
 import time
 import argparse
 import threading
-from Handler import Handler, FileModified
+from Handler import Handler, FileModified, runOperations
 import datetime
-from ImageConverter import Device, Converter
+from ImageConverter import Device, Method
+from DisplayPipeline import DisplayPipeline, PreRenderer, makePanel
+from DisplayService import DEFAULT_SOCKET, Reply, requestSettings, requestUpdate
+from ImageLibrary import ImageLibrary
 
 DEVICES = [Device.WS7in, Device.Inky, Device.Unknown]
 
@@ -37,11 +40,14 @@ def restricted_float(x):
     return x
 
 
-def getImagePath(dir_path, valid_extensions=('jpg', 'jpeg', 'png')):
+def getImagePath(dir_path, valid_extensions=('jpg', 'jpeg', 'png'), library=None):
     """
     Get the latest image file in the given directory
     """
 
+    if library:
+        return library.latest(dir_path)
+
     # get filepaths of all files and dirs in the given dir
     valid_files = [os.path.join(dir_path, filename) for filename in os.listdir(dir_path)]
     # filter out directories, no-extension, and wrong extension files
@@ -54,45 +60,47 @@ def getImagePath(dir_path, valid_extensions=('jpg', 'jpeg', 'png')):
     return max(valid_files, key=os.path.getmtime)
 
 
-def updateImage(device, saturation, folder):
-    image_path = getImagePath(folder)
+def updateImage(
+    device,
+    saturation,
+    folder,
+    method=Method.STEVENSON_ARCE,
+    spi_speed=None,
+    spi_validate=False,
+    clear=False,
+    clear_every=10,
+    socket_path=DEFAULT_SOCKET,
+    cache_budget=64 << 20,
+    library=None,
+):
+    image_path = getImagePath(folder, library=library)
     if image_path is None:
         return
+    reply = requestUpdate(image_path, clear, socket_path)
+    if reply == Reply.SENT:
+        print("Sent " + image_path + " to the display service")
+        return
+    if reply == Reply.REFUSED:
+        print("The display service refused " + image_path)
+        return
     try:
-        if device == Device.WS7in or device == DEVICES[-1]:
-            try:
-                from waveshare_epd import epd7in3f
-
-                print("epd7in3f Demo")
-                epd = epd7in3f.EPD()
-                Himage = Converter(
-                    epd.width, epd.height, image_path, saturation, Device.WS7in
-                ).convert()
-                print("init and Clear")
-                epd.init()
-                epd.Clear()
-                # Drawing on the image
-                print("1.Drawing on the image...")
-                epd.display(epd.getbuffer(Himage))
-                print("Goto Sleep...")
-                epd.sleep()
-            except KeyboardInterrupt:
-                print("ctrl + c:")
-                epd7in3f.epdconfig.module_exit()
-            exit(0)
-        elif device == Device.Inky or device == DEVICES[-1]:
-            try:
-                from inky.auto import InkyUC8159  # noqa: F401
-
-                inky = InkyUC8159(resolution=(600, 448))
-                Himage = Converter(
-                    inky.width, inky.height, image_path, saturation, Device.Inky
-                ).convert()
-                inky.set_image(Himage)
-                inky.show()
-                exit(0)
-            except Exception as e:
-                raise (e)
+        panel = makePanel(
+            device,
+            saturation,
+            method,
+            spi_speed,
+            spi_validate,
+            clear,
+            clear_every,
+            cache_budget=cache_budget,
+        )
+        pipeline = DisplayPipeline(panel)
+        try:
+            pipeline.submit(image_path)
+            pipeline.close()
+        except KeyboardInterrupt:
+            print("ctrl + c:")
+            panel.exit()
     except IOError as e:
         print(e)
 
@@ -131,6 +139,51 @@ def main():
         help="Image saturation (0.0-1.0)",
         default=0.5,
     )
+    parser.add_argument(
+        "-m",
+        "--method",
+        metavar="string",
+        choices=Method.ALL,
+        help="Error diffusion method",
+        default=Method.STEVENSON_ARCE,
+    )
+    parser.add_argument(
+        "--spi-speed",
+        metavar="hz",
+        type=int,
+        help="SPI clock of the panel, defaults to the driver profile",
+        default=None,
+    )
+    parser.add_argument(
+        "--spi-validate",
+        action="store_true",
+        help="Check a raised SPI clock with a MOSI-MISO loopback first",
+    )
+    parser.add_argument(
+        "--clear",
+        action="store_true",
+        help="Clear the panel before the next image",
+    )
+    parser.add_argument(
+        "--clear-every",
+        metavar="n",
+        type=int,
+        help="Clear the panel after this many image refreshes to remove ghosting",
+        default=10,
+    )
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        type=int,
+        help="Disk space for rendered frames, 0 disables the frame cache",
+        default=64,
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="path",
+        help="Display service socket, used instead of driving the panel when it is running",
+        default=DEFAULT_SOCKET,
+    )
     args = parser.parse_args()
 
     print("Checking Obex")
@@ -151,11 +204,31 @@ def main():
     wifiFiles = FileModified(storeop=True)
     blFiles = FileModified()
 
+    # renders uploads into the frame cache while the frame waits for the replug timeout
+    prerender = None
+    if args.cache_size:
+        panels = {}
+
+        def prerenderPanel():
+            # a running display service shows the frames, so render them with its settings
+            settings = requestSettings(args.socket) or (args.device, args.saturation, args.method)
+            if settings not in panels:
+                panels[settings] = makePanel(*settings, cache_budget=args.cache_size << 20)
+            return panels[settings]
+
+        prerender = PreRenderer(prerenderPanel)
+
     blHandler = Handler(source=args.bluetooth, target=args.wifi,
-                        actionLock=replugLock,  changed=blFiles)
+                        actionLock=replugLock,  changed=blFiles, prerender=prerender)
+    # only files that changed while not watching are read again
+    library = ImageLibrary()
+    library.reconcile(args.wifi)
+
     wifiHandler = Handler(source=args.wifi, target=None,
-                          actionLock=replugLock,  changed=wifiFiles, largeFileLock=largeFileLock)
+                          actionLock=replugLock,  changed=wifiFiles, largeFileLock=largeFileLock,
+                          prerender=prerender, library=library)
     blHandler.start()
+    wifiHandler.start()
     print("Initializing file system!")
     # TODO: handle files modified from usb side
     time.sleep(args.timeout/2)
@@ -163,26 +236,42 @@ def main():
     try:
         previousState = False
         while wifiHandler.alive and blHandler.alive:
+            events = wifiHandler.events
             if previousState != wifiFiles.modified:
                 previousState = wifiFiles.modified
                 print("Files modified!")
             wifiHandler.timeout_lock.acquire()
-            if ((datetime.datetime.now() - wifiHandler.timeout_start).total_seconds() > args.timeout) and wifiFiles.modified:
-                print("Restarting watchdog!")
-                # blHandler.stop()
-                # wifiHandler.stop()
-                print("Stopped Watching!")
-                while not len(wifiFiles.operations) == 0:
-                    op = wifiFiles.operations.pop(0)
-                    print("Executing: " + op)
-                    os.system(op)
-                updateImage(args.device, args.saturation, args.wifi)
-                os.execl(sys.executable, sys.executable, *sys.argv)
+            # seconds until the quiet period after the last event ends, every event re-arms it
+            remaining = args.timeout - (datetime.datetime.now() - wifiHandler.timeout_start).total_seconds()
+            if remaining <= 0 and wifiFiles.modified:
+                print("Updating!")
+                # the observers keep running, files dropped from here on start the next quiet period
+                runOperations(wifiHandler.reset())
+                updateImage(
+                    args.device,
+                    args.saturation,
+                    args.wifi,
+                    args.method,
+                    args.spi_speed,
+                    args.spi_validate,
+                    args.clear,
+                    args.clear_every,
+                    args.socket,
+                    args.cache_size << 20,
+                    library,
+                )
+                # --clear asks for one clear at startup, the panel session clears on its own after that
+                args.clear = False
+                previousState = False
+                remaining = None
+                print("Watching again!")
             elif wifiFiles.modified:
-                print("Replug in: " + str(round(args.timeout -
-                      (datetime.datetime.now() - wifiHandler.timeout_start).total_seconds())))
+                print("Replug in: " + str(round(remaining)))
+            else:
+                remaining = None
             wifiHandler.timeout_lock.release()
-            time.sleep(args.timeout / 10)
+            # sleep until the quiet period ends or the next event arrives
+            wifiHandler.wait_event(events, remaining)
 
     except KeyboardInterrupt:
         print("Stopped Watching!")
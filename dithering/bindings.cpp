@@ -0,0 +1,123 @@
+#include "dither.h"
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <pybind11/stl.h>
+#include <pybind11/stl/filesystem.h>
+#include <opencv2/opencv.hpp>
+#include <array>
+#include <list>
+#include <map>
+#include <optional>
+#include <stdexcept>
+
+namespace py = pybind11;
+
+namespace
+{
+    using RGBArray = py::array_t<std::uint8_t, py::array::c_style | py::array::forcecast>;
+
+    // the lookup table cache lives next to the extension module, like it does for the dither binary
+    std::filesystem::path moduleDirectory()
+    {
+        const auto file = py::module_::import("framy_dither").attr("__file__").cast<std::string>();
+        return std::filesystem::path(file).parent_path();
+    }
+
+    template <typename T>
+    T lookupName(std::map<std::string, T>& names, const std::string& name, const std::string& kind)
+    {
+        if (!names.contains(name))
+        {
+            std::string valid;
+            for (const auto& [valid_name, value] : names)
+            {
+                valid += " " + valid_name;
+            }
+            throw std::invalid_argument("unknown " + kind + " '" + name + "', expected one of" + valid);
+        }
+        return names[name];
+    }
+
+    std::list<cv::Vec3b> makePalette(const std::optional<std::vector<std::array<std::uint8_t, 3>>>& palette,
+                                     const float saturation)
+    {
+        if (saturation < 0.0f || saturation > 1.0f)
+        {
+            throw std::invalid_argument("saturation must be within [0, 1]");
+        }
+        if (!palette)
+        {
+            return dither::palettes::blend(dither::palettes::waveshare7color,
+                                           dither::palettes::waveshare7color_saturated, saturation);
+        }
+        if (palette->empty() || palette->size() > 16)
+        {
+            throw std::invalid_argument("palette must hold between 1 and 16 colours");
+        }
+        std::list<cv::Vec3b> colors;
+        for (const auto& [r, g, b] : *palette)
+        {
+            colors.emplace_back(b, g, r);
+        }
+        return colors;
+    }
+
+    py::array_t<std::uint8_t> ditherImage(const RGBArray& rgb, const std::optional<std::filesystem::path>& cache_dir,
+                                          const std::optional<unsigned> seed, const float jitter,
+                                          const std::string& method_name, const std::string& norm_name,
+                                          const std::optional<std::vector<std::array<std::uint8_t, 3>>>& palette,
+                                          const float saturation)
+    {
+        if (rgb.ndim() != 3 || rgb.shape(2) != 3)
+        {
+            throw std::invalid_argument("expected an RGB image of shape (height, width, 3)");
+        }
+        const auto rows = static_cast<int>(rgb.shape(0));
+        const auto cols = static_cast<int>(rgb.shape(1));
+        const auto directory = cache_dir.value_or(moduleDirectory());
+        const auto noise = seed ? dither::noiseTexture(*seed, jitter) : cv::Mat();
+        const auto diff_method = lookupName(dither::method_names, method_name, "method");
+        const auto norm = lookupName(dither::norm_names, norm_name, "norm");
+        const auto colors = makePalette(palette, saturation);
+
+        py::array_t<std::uint8_t> indices({rows, cols});
+        {
+            py::gil_scoped_release release;
+            cv::Mat image;
+            cv::cvtColor(cv::Mat(rows, cols, CV_8UC3, const_cast<std::uint8_t*>(rgb.data())), image,
+                         cv::COLOR_RGB2BGR);
+            dither::ditherImage(colors, image, diff_method, norm, directory, noise)
+                .copyTo(cv::Mat(rows, cols, CV_8UC1, indices.mutable_data()));
+        }
+        return indices;
+    }
+
+    py::bytes packIndices(const py::array_t<std::uint8_t, py::array::c_style | py::array::forcecast>& indices)
+    {
+        if (indices.ndim() != 2)
+        {
+            throw std::invalid_argument("expected palette indices of shape (height, width)");
+        }
+        const cv::Mat plane(static_cast<int>(indices.shape(0)), static_cast<int>(indices.shape(1)), CV_8UC1,
+                            const_cast<std::uint8_t*>(indices.data()));
+        const auto packed = dither::packIndices(plane);
+        return {reinterpret_cast<const char*>(packed.data()), packed.size()};
+    }
+}
+
+PYBIND11_MODULE(framy_dither, m)
+{
+    m.doc() = "In-process access to the Framy error diffusion dither engine";
+
+    m.def("dither", &ditherImage, py::arg("image"), py::arg("cache_dir") = py::none(), py::arg("seed") = py::none(),
+          py::arg("jitter") = 4.0f, py::arg("method") = "stevenson-arce", py::arg("norm") = "l2",
+          py::arg("palette") = py::none(), py::arg("saturation") = 0.0f,
+          "Dither an RGB uint8 array of shape (height, width, 3) and return the palette indices as a uint8\n"
+          "array of shape (height, width). The palette is a list of (r, g, b) tuples in panel index order\n"
+          "and defaults to the waveshare 7 colour palette blended towards the saturated panel colours by\n"
+          "saturation. Passing a seed adds a tiled Lab noise texture of the given jitter amplitude, the\n"
+          "result stays reproducible per seed.");
+    m.def("pack", &packIndices, py::arg("indices"),
+          "Pack palette indices of shape (height, width) two per byte, the first pixel in the high nibble,\n"
+          "as expected by the 7 colour panels.");
+}
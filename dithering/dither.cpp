@@ -1,25 +1,24 @@
 #include "dither.h"
+#include "lut.h"
 #include <omp.h>
 #include <opencv2/opencv.hpp>
 #include <vector>
-#include <optional>
 #include <map>
 #include <random>
 #include <list>
 #include <algorithm>
+#include <atomic>
+#include <thread>
 #include <iostream>
-
-namespace
-{
-    std::random_device rd;
-    std::mt19937 g(rd());
-}
+#include <fstream>
+#include <sstream>
+#include <stdexcept>
 
 namespace dither
 {
     namespace palettes
     {
-        const auto waveshare7color = std::list{
+        const std::list<cv::Vec3b> waveshare7color = {
             dither::color_map[dither::color::Black],
             dither::color_map[dither::color::White],
             dither::color_map[dither::color::Green],
@@ -28,119 +27,248 @@ namespace dither
             dither::color_map[dither::color::Yellow],
             dither::color_map[dither::color::Orange]
         };
+
+        // colours as the panel actually shows them
+        const std::list<cv::Vec3b> waveshare7color_saturated = {
+            {57, 48, 57},
+            {255, 255, 255},
+            {70, 91, 58},
+            {94, 59, 61},
+            {75, 72, 156},
+            {71, 190, 208},
+            {73, 106, 177}
+        };
+
+        std::list<cv::Vec3b> blend(const std::list<cv::Vec3b>& desaturated, const std::list<cv::Vec3b>& saturated,
+                                   const float saturation)
+        {
+            std::list<cv::Vec3b> blended;
+            auto saturated_color = saturated.begin();
+            for (const auto& color : desaturated)
+            {
+                cv::Vec3b mixed;
+                for (auto channel = 0; channel < 3; channel++)
+                {
+                    mixed[channel] = cv::saturate_cast<uchar>(
+                        saturation * (*saturated_color)[channel] + (1.0f - saturation) * color[channel]);
+                }
+                blended.push_back(mixed);
+                ++saturated_color;
+            }
+            return blended;
+        }
+
+        std::list<cv::Vec3b> load(const std::filesystem::path& path)
+        {
+            std::ifstream file(path);
+            if (!file)
+            {
+                throw std::runtime_error("could not open palette " + path.string());
+            }
+            std::list<cv::Vec3b> palette;
+            std::string line;
+            while (std::getline(file, line))
+            {
+                if (line.empty() || line.front() == '#')
+                {
+                    continue;
+                }
+                std::istringstream values(line);
+                int r, g, b;
+                if (!(values >> r >> g >> b) || std::min({r, g, b}) < 0 || std::max({r, g, b}) > 255)
+                {
+                    throw std::runtime_error("invalid palette colour '" + line + "' in " + path.string());
+                }
+                palette.emplace_back(b, g, r);
+            }
+            if (palette.empty() || palette.size() > 16)
+            {
+                throw std::runtime_error("palette " + path.string() + " must hold between 1 and 16 colours");
+            }
+            return palette;
+        }
+    }
+
+    // convert a BGR matrix to a float Lab matrix (L in [0, 100], a/b in [-127, 127])
+    cv::Mat toLab(const cv::Mat& bgr)
+    {
+        cv::Mat lab;
+        bgr.convertTo(lab, CV_32FC3, 1.0 / 255.0);
+        cv::cvtColor(lab, lab, cv::COLOR_BGR2Lab);
+        return lab;
+    }
+
+    std::vector<Lab> toLab(const std::vector<cv::Vec3b>& palette)
+    {
+        const cv::Mat bgr(1, static_cast<int>(palette.size()), CV_8UC3, const_cast<cv::Vec3b*>(palette.data()));
+        const cv::Mat lab = toLab(bgr);
+        return {lab.begin<Lab>(), lab.end<Lab>()};
     }
 
-    double colorDistance(const cv::Vec3b& color1, const cv::Vec3b& color2, const cv::NormTypes norm)
+    float colorDistance(const Lab& color1, const Lab& color2, const cv::NormTypes norm)
     {
-        // transform BGR to LAB
-        cv::Mat lab1, lab2;
-        cv::cvtColor(cv::Mat(1, 1, CV_8UC3, color1), lab1, cv::COLOR_BGR2Lab);
-        cv::cvtColor(cv::Mat(1, 1, CV_8UC3, color2), lab2, cv::COLOR_BGR2Lab);
-        // convert to 3 channel
-        lab1.convertTo(lab1, CV_64F);
-        lab2.convertTo(lab2, CV_64F);
-
-        auto dist = lab1 - lab2;
-
-        // calculate the distance
-        return cv::norm(dist, norm);
+        const auto dl = color1[0] - color2[0];
+        const auto da = color1[1] - color2[1];
+        const auto db = color1[2] - color2[2];
+        switch (norm)
+        {
+        case cv::NORM_L1:
+            return std::abs(dl) + std::abs(da) + std::abs(db);
+        case cv::NORM_INF:
+            return std::max({std::abs(dl), std::abs(da), std::abs(db)});
+        default:
+            // the square root is monotonic, comparing squared distances is sufficient
+            return dl * dl + da * da + db * db;
+        }
     }
 
-    cv::Vec3b pixel_closest_colour(std::vector<cv::Vec3b>& palette, const cv::Vec3b& old_pixel,
-                                   const cv::NormTypes norm)
+    // ties are broken deterministically in favour of the first palette colour
+    int pixel_closest_colour(const std::vector<Lab>& palette, const Lab& old_pixel, const cv::NormTypes norm)
     {
-        std::optional<cv::Vec3b> closest_colour = std::nullopt;
-        auto min_distance = std::numeric_limits<double>::max();
-        std::ranges::shuffle(palette, g);
-        #pragma omp for
-        for (const auto& color : palette)
+        auto closest_colour = 0;
+        auto min_distance = std::numeric_limits<float>::max();
+        for (auto index = 0; index < static_cast<int>(palette.size()); index++)
         {
-            if (const auto distance = colorDistance(old_pixel, color, norm); distance < min_distance)
+            if (const auto distance = colorDistance(old_pixel, palette[index], norm); distance < min_distance)
             {
                 min_distance = distance;
-                closest_colour = color;
+                closest_colour = index;
             }
         }
-        return closest_colour.value_or(palette.front());
+        return closest_colour;
     }
 
-    void apply_neighbour_diffusion(const method& diff_method,
-                                   cv::Mat& image, const int y, const int x,
-                                   const cv::Vec3b& quantization_error)
+    cv::Mat noiseTexture(const unsigned seed, const float amplitude)
     {
-        #pragma omp for
-        for (auto [dx, dy, diffusion_coefficient] : diffusion_map[diff_method])
+        std::mt19937 generator(seed);
+        std::uniform_real_distribution<float> jitter(-amplitude, amplitude);
+        cv::Mat texture(noise_size, noise_size, CV_32FC3);
+        for (auto value = texture.begin<Lab>(); value != texture.end<Lab>(); ++value)
         {
-            const auto xn = x + dx;
-            const auto yn = y + dy;
-            if ((0 <= xn && xn < image.cols) && (0 <= yn && yn < image.rows))
-            {
-                image.at<cv::Vec3b>(yn, xn) +=
-                    quantization_error * diffusion_coefficient;
-            }
+            const auto l = jitter(generator);
+            const auto a = jitter(generator);
+            const auto b = jitter(generator);
+            *value = Lab(l, a, b);
         }
+        return texture;
     }
 
-    void ditherImage(const std::list<cv::Vec3b>& palette, cv::Mat& image,
-                     const method diff_method = FLOYD_STEINBERG, const cv::NormTypes norm = cv::NORM_L2)
+    // rows below the current one and columns to either side reached by the diffusion kernel
+    std::pair<int, int> kernel_extent(const std::vector<std::tuple<int, int, float>>& kernel)
     {
-        std::vector<cv::Vec3b> colors = {palette.begin(), palette.end()};
+        auto rows = 0;
+        auto reach = 0;
+        for (const auto& [dx, dy, diffusion_coefficient] : kernel)
+        {
+            rows = std::max(rows, dy);
+            reach = std::max(reach, std::abs(dx));
+        }
+        return {rows, reach};
+    }
+
+    void wait_for(const std::atomic<int>& progress, const int target)
+    {
+        while (progress.load(std::memory_order_acquire) < target)
+        {
+            std::this_thread::yield();
+        }
+    }
+
+    // errors is a ring of kernel height float rows, padded by the kernel reach so no bounds checks are needed
+    void apply_neighbour_diffusion(const std::vector<std::tuple<int, int, float>>& kernel,
+                                   cv::Mat& errors, const int reach, const int y, const int x,
+                                   const Lab& quantization_error)
+    {
+        for (const auto& [dx, dy, diffusion_coefficient] : kernel)
+        {
+            errors.ptr<Lab>((y + dy) % errors.rows)[reach + x + dx] += quantization_error * diffusion_coefficient;
+        }
+    }
+
+    cv::Mat ditherImage(const std::list<cv::Vec3b>& palette, cv::Mat& image,
+                        const method diff_method, const cv::NormTypes norm,
+                        const std::filesystem::path& cache_dir, const cv::Mat& noise)
+    {
+        const std::vector<cv::Vec3b> colors = {palette.begin(), palette.end()};
+        const auto lab_colors = toLab(colors);
+        const ColourLUT lut(lab_colors, norm, cache_dir);
+
+        const auto& kernel = diffusion_map[diff_method];
+        const auto [kernel_rows, reach] = kernel_extent(kernel);
 
-        
         std::cout << "Dithering image using " << diff_method << " method" << std::endl;
 
-        #pragma omp for 
+        auto lab_image = toLab(image);
+        const auto threads = omp_get_max_threads();
+        // every row in flight needs its own error row plus the rows its kernel reaches into
+        cv::Mat errors = cv::Mat::zeros(kernel_rows + 1 + threads, image.cols + 2 * reach, CV_32FC3);
+        // columns finished per row, a row is retired once its error row has been recycled
+        std::vector<std::atomic<int>> progress(image.rows);
+        cv::Mat indices(image.rows, image.cols, CV_8UC1);
+        const auto retired = image.cols + 1;
+        // a row trails the one above by twice the kernel reach, so every error cell receives its
+        // contributions in the same order as in a serial pass and the output is identical
+        const auto lag = 2 * reach;
+
+        #pragma omp parallel for schedule(static, 1) num_threads(threads)
         for (auto y = 0; y < image.rows; y++)
         {
+            // the error rows this row diffuses into must no longer be in use by earlier rows
+            for (auto dy = 0; dy <= kernel_rows; dy++)
+            {
+                if (const auto previous = y + dy - errors.rows; previous >= 0)
+                {
+                    wait_for(progress[previous], retired);
+                }
+            }
             auto* pixel = image.ptr<cv::Vec3b>(y);
-            std::cout.precision(2);
-            std::cout << "\rprogress: " << 1.0 * y / image.rows << "\t" << std::flush;
+            auto* index_row = indices.ptr<std::uint8_t>(y);
+            const auto* lab_pixel = lab_image.ptr<Lab>(y);
+            auto* error_row = errors.ptr<Lab>(y % errors.rows);
+            const auto* error = error_row + reach;
+            const auto* jitter = noise.empty() ? nullptr : noise.ptr<Lab>(y % noise.rows);
+            if (omp_get_thread_num() == 0)
+            {
+                std::cout.precision(2);
+                std::cout << "\rprogress: " << 1.0 * y / image.rows << "\t" << std::flush;
+            }
 
-            // shuffle the pixels in the row
             for (auto x = 0; x < image.cols; x++)
             {
-                auto new_pixel = pixel_closest_colour(colors, pixel[x], norm);
-                auto quantization_error = pixel[x] - new_pixel;
-                
-                pixel[x] = new_pixel;
-                apply_neighbour_diffusion(diff_method, image, y, x, quantization_error);
-                    
+                if (y > 0)
+                {
+                    wait_for(progress[y - 1], std::min(image.cols, x + lag + 1));
+                }
+                const auto value = lab_pixel[x] + error[x];
+                const auto index = jitter ? lut.lookup(value + jitter[x % noise.cols]) : lut.lookup(value);
+                const auto quantization_error = value - lab_colors[index];
+
+                pixel[x] = colors[index];
+                index_row[x] = index;
+                apply_neighbour_diffusion(kernel, errors, reach, y, x, quantization_error);
+                progress[y].store(x + 1, std::memory_order_release);
             }
+            // the row is consumed, recycle its error row for a later one
+            std::fill_n(error_row, errors.cols, Lab());
+            progress[y].store(retired, std::memory_order_release);
         }
         std::cout << "\rprogress: done\t\t" << std::endl;
-        // color each pixel in the image white
-        #pragma omp for
-        for (auto y = 0; y < image.rows; y++)
+        return indices;
+    }
+
+    std::vector<std::uint8_t> packIndices(const cv::Mat& indices)
+    {
+        const auto count = indices.total();
+        std::vector<std::uint8_t> packed((count + 1) / 2);
+        std::size_t i = 0;
+        for (auto y = 0; y < indices.rows; y++)
         {
-            auto* pix = image.ptr<cv::Vec3b>(y);
-            
-            for (auto x = 0; x < image.cols; x++)
+            const auto* index = indices.ptr<std::uint8_t>(y);
+            for (auto x = 0; x < indices.cols; x++, i++)
             {
-               pix[x] = pixel_closest_colour(colors, pix[x], norm);
+                packed[i / 2] |= (i % 2 == 0) ? index[x] << 4 : index[x];
             }
         }
+        return packed;
     }
 }
-
-
-void generateDitheredImage(const std::string& image_path, const std::string& out_path)
-{
-    cv::Mat img = cv::imread(image_path, cv::IMREAD_COLOR);
-    dither::ditherImage(dither::palettes::waveshare7color, img, dither::STEVENSON_ARCE, cv::NORM_L2);
-    cv::imwrite(out_path, img);
-}
-
-int main(const int argc, char** argv)
-{
-    if (argc != 3)
-    {
-        std::cerr << "Usage: " << argv[0] <<
-            " <input_image_path> <output_image_path>"
-            <<
-            std::endl;
-        return 1;
-    }
-    const std::string image_path = argv[1];
-    const std::string out_path = argv[2];
-    generateDitheredImage(image_path, out_path);
-}
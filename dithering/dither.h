@@ -5,6 +5,8 @@
 #include <tuple>
 #include <map>
 #include <list>
+#include <filesystem>
+#include <string>
 
 namespace dither
 {
@@ -33,6 +35,38 @@ namespace dither
     };
 
     using BGR = cv::Vec3b;
+    using Lab = cv::Vec3f;
+
+    cv::Mat toLab(const cv::Mat& bgr);
+    std::vector<Lab> toLab(const std::vector<cv::Vec3b>& palette);
+    float colorDistance(const Lab& color1, const Lab& color2, cv::NormTypes norm);
+    int pixel_closest_colour(const std::vector<Lab>& palette, const Lab& old_pixel, cv::NormTypes norm);
+
+    // tiled Lab jitter added before quantisation, the same seed always yields the same texture
+    constexpr int noise_size = 64;
+    cv::Mat noiseTexture(unsigned seed, float amplitude);
+
+    namespace palettes
+    {
+        extern const std::list<cv::Vec3b> waveshare7color;
+        extern const std::list<cv::Vec3b> waveshare7color_saturated;
+
+        // blend each pure panel colour with its measured, saturated counterpart
+        std::list<cv::Vec3b> blend(const std::list<cv::Vec3b>& desaturated, const std::list<cv::Vec3b>& saturated,
+                                   float saturation);
+        // one "R G B" colour per line in panel index order, empty lines and lines starting with # are skipped
+        std::list<cv::Vec3b> load(const std::filesystem::path& path);
+    }
+
+    // dither the BGR image in place to the closest colours of the palette and return the palette
+    // indices as a CV_8UC1 image, an empty noise texture gives a fully deterministic result
+    cv::Mat ditherImage(const std::list<cv::Vec3b>& palette, cv::Mat& image,
+                        method diff_method, cv::NormTypes norm,
+                        const std::filesystem::path& cache_dir, const cv::Mat& noise = cv::Mat());
+
+    // two palette indices per byte, the first pixel in the high nibble
+    std::vector<std::uint8_t> packIndices(const cv::Mat& indices);
+
     static std::map<dither::color, dither::BGR> color_map = {
 
         {White, {255, 255, 255}},
@@ -159,5 +193,22 @@ namespace dither
             }
         }
     };
-}
 
+    static std::map<std::string, dither::method> method_names = {
+        {"floyd-steinberg", FLOYD_STEINBERG},
+        {"jarvis-judice-ninke", JARVIS_JUDICE_NINKE},
+        {"stucki", STUCKI},
+        {"burkes", BURKES},
+        {"sierra", SIERRA},
+        {"sierra-2", SIERRA_2},
+        {"sierra-3", SIERRA_3},
+        {"atkinson", ATKINSON},
+        {"stevenson-arce", STEVENSON_ARCE}
+    };
+
+    static std::map<std::string, cv::NormTypes> norm_names = {
+        {"l1", cv::NORM_L1},
+        {"l2", cv::NORM_L2},
+        {"inf", cv::NORM_INF}
+    };
+}
@@ -0,0 +1,193 @@
+#include "lut.h"
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#include <cerrno>
+#include <cstdlib>
+#include <cstring>
+#include <sstream>
+#include <iostream>
+
+namespace
+{
+    constexpr char magic[4] = {'F', 'L', 'U', 'T'};
+    constexpr std::uint32_t version = 2;
+
+    struct Header
+    {
+        char magic[4];
+        std::uint32_t version;
+        std::uint32_t side;
+        std::uint32_t reserved;
+        std::uint64_t key;
+    };
+
+    // FNV-1a over the palette, the norm and the table geometry
+    std::uint64_t cacheKey(const std::vector<dither::Lab>& palette, const cv::NormTypes norm)
+    {
+        std::uint64_t hash = 14695981039346656037ull;
+        const auto mix = [&hash](const void* data, const std::size_t size)
+        {
+            const auto* bytes = static_cast<const std::uint8_t*>(data);
+            for (std::size_t i = 0; i < size; i++)
+            {
+                hash ^= bytes[i];
+                hash *= 1099511628211ull;
+            }
+        };
+        for (const auto& color : palette)
+        {
+            mix(color.val, sizeof(color.val));
+        }
+        const std::int32_t values[] = {static_cast<std::int32_t>(norm), dither::ColourLUT::side};
+        mix(values, sizeof(values));
+        return hash;
+    }
+
+    bool writeAll(const int fd, const void* data, std::size_t size)
+    {
+        const auto* bytes = static_cast<const char*>(data);
+        while (size > 0)
+        {
+            const auto written = write(fd, bytes, size);
+            if (written < 0)
+            {
+                if (errno == EINTR)
+                {
+                    continue;
+                }
+                return false;
+            }
+            bytes += written;
+            size -= static_cast<std::size_t>(written);
+        }
+        return true;
+    }
+}
+
+namespace dither
+{
+    ColourLUT::ColourLUT(const std::vector<Lab>& palette, const cv::NormTypes norm,
+                         const std::filesystem::path& cache_dir)
+    {
+        const auto key = cacheKey(palette, norm);
+        std::stringstream name;
+        name << ".dither_lut_" << std::hex << key << ".bin";
+        const auto path = cache_dir / name.str();
+
+        if (load(path, key))
+        {
+            return;
+        }
+        std::cout << "Building colour lookup table " << path << std::endl;
+        build(palette, norm);
+        store(path, key);
+    }
+
+    ColourLUT::~ColourLUT()
+    {
+        if (mapping)
+        {
+            munmap(mapping, mapping_size);
+        }
+    }
+
+    bool ColourLUT::load(const std::filesystem::path& path, const std::uint64_t key)
+    {
+        const auto fd = open(path.c_str(), O_RDONLY);
+        if (fd < 0)
+        {
+            return false;
+        }
+        struct stat info{};
+        const auto expected = sizeof(Header) + static_cast<std::size_t>(side) * side * side;
+        if (fstat(fd, &info) != 0 || static_cast<std::size_t>(info.st_size) != expected)
+        {
+            close(fd);
+            return false;
+        }
+        auto* data = mmap(nullptr, expected, PROT_READ, MAP_SHARED, fd, 0);
+        close(fd);
+        if (data == MAP_FAILED)
+        {
+            return false;
+        }
+        const auto* header = static_cast<const Header*>(data);
+        if (std::memcmp(header->magic, magic, sizeof(magic)) != 0 || header->version != version ||
+            header->side != side || header->key != key)
+        {
+            munmap(data, expected);
+            return false;
+        }
+        mapping = data;
+        mapping_size = expected;
+        table = static_cast<const std::uint8_t*>(data) + sizeof(Header);
+        return true;
+    }
+
+    void ColourLUT::build(const std::vector<Lab>& palette, const cv::NormTypes norm)
+    {
+        owned.resize(static_cast<std::size_t>(side) * side * side);
+
+        // every cell maps to the palette colour closest to its centre
+        constexpr auto l_step = 100.0f / side;
+        constexpr auto ab_step = 256.0f / side;
+        std::size_t index = 0;
+        for (auto l = 0; l < side; l++)
+        {
+            for (auto a = 0; a < side; a++)
+            {
+                for (auto b = 0; b < side; b++)
+                {
+                    const Lab center((l + 0.5f) * l_step, -128.0f + (a + 0.5f) * ab_step,
+                                     -128.0f + (b + 0.5f) * ab_step);
+                    owned[index++] = static_cast<std::uint8_t>(pixel_closest_colour(palette, center, norm));
+                }
+            }
+        }
+        table = owned.data();
+    }
+
+    void ColourLUT::store(const std::filesystem::path& path, const std::uint64_t key) const
+    {
+        Header header{};
+        std::memcpy(header.magic, magic, sizeof(magic));
+        header.version = version;
+        header.side = side;
+        header.key = key;
+
+        // write to a temporary file of this builder first, so concurrent readers never map a partial
+        // table and builders in other threads or processes never write into the same file
+        auto temporary = path.string() + ".XXXXXX";
+        const auto fd = mkstemp(temporary.data());
+        if (fd < 0)
+        {
+            std::cerr << "Could not create colour lookup table " << temporary << std::endl;
+            return;
+        }
+        // mkstemp creates the file private, the table is shared like the ones written before
+        const auto written = fchmod(fd, 0644) == 0 && writeAll(fd, &header, sizeof(header)) &&
+                             writeAll(fd, owned.data(), owned.size());
+        if (close(fd) != 0 || !written)
+        {
+            std::cerr << "Could not write colour lookup table " << temporary << std::endl;
+            unlink(temporary.c_str());
+            return;
+        }
+        std::error_code error;
+        std::filesystem::rename(temporary, path, error);
+        if (error)
+        {
+            std::cerr << "Could not store colour lookup table " << path << ": " << error.message() << std::endl;
+            std::filesystem::remove(temporary, error);
+        }
+    }
+
+    std::filesystem::path executableDirectory()
+    {
+        std::error_code error;
+        const auto executable = std::filesystem::read_symlink("/proc/self/exe", error);
+        return error ? std::filesystem::current_path() : executable.parent_path();
+    }
+}
@@ -0,0 +1,51 @@
+#pragma once
+
+#include "dither.h"
+#include <opencv2/opencv.hpp>
+#include <algorithm>
+#include <cstdint>
+#include <filesystem>
+#include <vector>
+
+namespace dither
+{
+    // quantised Lab -> palette index lookup table, built once per palette and norm and
+    // persisted as a memory mapped cache file
+    class ColourLUT
+    {
+    public:
+        static constexpr int bits = 6;
+        static constexpr int side = 1 << bits;
+
+        ColourLUT(const std::vector<Lab>& palette, cv::NormTypes norm, const std::filesystem::path& cache_dir);
+        ~ColourLUT();
+
+        ColourLUT(const ColourLUT&) = delete;
+        ColourLUT& operator=(const ColourLUT&) = delete;
+
+        std::uint8_t lookup(const Lab& color) const
+        {
+            return table[cell(color[0], 0.0f, 100.0f) << (2 * bits) |
+                         cell(color[1], -128.0f, 128.0f) << bits |
+                         cell(color[2], -128.0f, 128.0f)];
+        }
+
+    private:
+        static int cell(const float value, const float low, const float high)
+        {
+            const auto index = static_cast<int>((value - low) * (side / (high - low)));
+            return std::clamp(index, 0, side - 1);
+        }
+
+        bool load(const std::filesystem::path& path, std::uint64_t key);
+        void build(const std::vector<Lab>& palette, cv::NormTypes norm);
+        void store(const std::filesystem::path& path, std::uint64_t key) const;
+
+        const std::uint8_t* table = nullptr;
+        std::vector<std::uint8_t> owned;
+        void* mapping = nullptr;
+        std::size_t mapping_size = 0;
+    };
+
+    std::filesystem::path executableDirectory();
+}
@@ -0,0 +1,159 @@
+#include "dither.h"
+#include "lut.h"
+#include <opencv2/opencv.hpp>
+#include <fstream>
+#include <iostream>
+#include <optional>
+
+namespace
+{
+    // Lab jitter amplitude used when a noise seed is given
+    constexpr float noise_amplitude = 4.0f;
+
+    struct Options
+    {
+        std::string image_path;
+        std::string out_path;
+        dither::method diff_method = dither::STEVENSON_ARCE;
+        cv::NormTypes norm = cv::NORM_L2;
+        std::optional<std::filesystem::path> palette;
+        float saturation = 0.0f;
+        std::string format = "png";
+        std::optional<unsigned> noise_seed;
+    };
+
+    void usage(const char* name)
+    {
+        std::cerr << "Usage: " << name << " [options] <input_image_path> <output_path>\n"
+            << "  --method <name>       diffusion kernel, one of";
+        for (const auto& [method_name, diff_method] : dither::method_names)
+        {
+            std::cerr << " " << method_name;
+        }
+        std::cerr << " (default stevenson-arce)\n"
+            << "  --norm <l1|l2|inf>    colour distance in Lab space (default l2)\n"
+            << "  --palette <file>      \"R G B\" per line in panel index order (default waveshare 7 colour)\n"
+            << "  --saturation <0..1>   blend of the built-in palette towards the saturated panel colours\n"
+            << "  --format <png|raw|packed>\n"
+            << "                        dithered image, one index byte per pixel or two indices per byte\n"
+            << "  --seed <n>            add a seeded noise texture before quantisation"
+            << std::endl;
+    }
+
+    std::optional<Options> parseArguments(const int argc, char** argv)
+    {
+        Options options;
+        std::vector<std::string> positional;
+        for (auto i = 1; i < argc; i++)
+        {
+            const std::string argument = argv[i];
+            if (!argument.starts_with("--"))
+            {
+                positional.push_back(argument);
+                continue;
+            }
+            if (i + 1 == argc)
+            {
+                std::cerr << "Missing value for " << argument << std::endl;
+                return std::nullopt;
+            }
+            const std::string value = argv[++i];
+            if (argument == "--method" && dither::method_names.contains(value))
+            {
+                options.diff_method = dither::method_names[value];
+            }
+            else if (argument == "--norm" && dither::norm_names.contains(value))
+            {
+                options.norm = dither::norm_names[value];
+            }
+            else if (argument == "--palette")
+            {
+                options.palette = value;
+            }
+            else if (argument == "--saturation")
+            {
+                options.saturation = std::stof(value);
+                if (options.saturation < 0.0f || options.saturation > 1.0f)
+                {
+                    std::cerr << "Saturation must be within [0, 1]" << std::endl;
+                    return std::nullopt;
+                }
+            }
+            else if (argument == "--format" && (value == "png" || value == "raw" || value == "packed"))
+            {
+                options.format = value;
+            }
+            else if (argument == "--seed")
+            {
+                options.noise_seed = std::stoul(value);
+            }
+            else
+            {
+                std::cerr << "Invalid option " << argument << " " << value << std::endl;
+                return std::nullopt;
+            }
+        }
+        if (positional.size() != 2)
+        {
+            return std::nullopt;
+        }
+        options.image_path = positional[0];
+        options.out_path = positional[1];
+        return options;
+    }
+
+    void writeBytes(const std::string& out_path, const std::uint8_t* data, const std::size_t size)
+    {
+        std::ofstream file(out_path, std::ios::binary | std::ios::trunc);
+        file.write(reinterpret_cast<const char*>(data), static_cast<std::streamsize>(size));
+    }
+}
+
+void generateDitheredImage(const Options& options)
+{
+    cv::Mat img = cv::imread(options.image_path, cv::IMREAD_COLOR);
+    if (img.empty())
+    {
+        throw std::runtime_error("could not read image " + options.image_path);
+    }
+    const auto palette = options.palette
+                             ? dither::palettes::load(*options.palette)
+                             : dither::palettes::blend(dither::palettes::waveshare7color,
+                                                       dither::palettes::waveshare7color_saturated,
+                                                       options.saturation);
+    const auto noise = options.noise_seed ? dither::noiseTexture(*options.noise_seed, noise_amplitude) : cv::Mat();
+    const auto indices = dither::ditherImage(palette, img, options.diff_method, options.norm,
+                                             dither::executableDirectory(), noise);
+    if (options.format == "raw")
+    {
+        writeBytes(options.out_path, indices.ptr<std::uint8_t>(0), indices.total());
+    }
+    else if (options.format == "packed")
+    {
+        const auto packed = dither::packIndices(indices);
+        writeBytes(options.out_path, packed.data(), packed.size());
+    }
+    else
+    {
+        cv::imwrite(options.out_path, img);
+    }
+}
+
+int main(const int argc, char** argv)
+{
+    try
+    {
+        const auto options = parseArguments(argc, argv);
+        if (!options)
+        {
+            usage(argv[0]);
+            return 1;
+        }
+        generateDitheredImage(*options);
+    }
+    catch (const std::exception& error)
+    {
+        std::cerr << error.what() << std::endl;
+        return 1;
+    }
+}
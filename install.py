@@ -164,7 +164,7 @@ if subprocess.run(["dpkg", "-s", "libopenobex2"], capture_output=True).returncod
     remove(f"{OBEX_FILE}")
 
 subprocess.run(["apt-get", "install", "--fix-broken", "-y"])
-subprocess.run([PYTHON, "-m" ,"pip", "install", "watchdog", "dbus-python", "PyGObject", "RPi.GPIO", "spidev", "inky", "git+https://www.github.com/hbldh/hitherdither"])
+subprocess.run([PYTHON, "-m" ,"pip", "install", "watchdog", "dbus-python", "PyGObject", "RPi.GPIO", "spidev", "inky"])
 
 makedirs(MOUNT_FILE, mode=0o2777, exist_ok=True)
 run_command([["mount", DATA_FILE, MOUNT_FILE]], "Mounting USB Storage to shared folder")
@@ -219,10 +219,10 @@ set_compat("/etc/systemd/system/dbus-org.bluez.service", "bluez")
 set_compat("/etc/systemd/system/bluetooth.target.wants/bluetooth.service", "target.wants.bluetooth")
 set_compat("/lib/systemd/system/bluetooth.service", "system/bluetooth")
 
-run_command([["apt-get", "install", "cmake", "libopencv-dev", "libomp-dev, "-y"]], "Installing dithering components")
+run_command([["apt-get", "install", "cmake", "libopencv-dev", "libomp-dev", "pybind11-dev", "-y"]], "Installing dithering components")
 
-# generate dithering executable
-subprocess.run(["cmake", "-DCMAKE_BUILD_TYPE=Release", "."])
+# generate dithering executable and python module
+subprocess.run(["cmake", "-DCMAKE_BUILD_TYPE=Release", f"-DPython_EXECUTABLE={PYTHON}", "."])
 subprocess.run(["make"])
 
 
@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 80
@@ -251,6 +252,13 @@ class EPD:
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
 
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.digital_write(self.dc_pin, 1)
+        epdconfig.digital_write(self.cs_pin, 0)
+        epdconfig.spi_writebyte2(data)
+        epdconfig.digital_write(self.cs_pin, 1)
+
     def ReadBusy(self):
         logger.debug("e-Paper busy")
         self.send_command(0x71)
@@ -270,21 +278,17 @@ class EPD:
 
     def SetFulltReg(self):
         self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(self.lut_w1[count])
+        self.send_data2(self.lut_w1[:42])
 
         self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(self.lut_b1[count])
+        self.send_data2(self.lut_b1[:42])
 
     def SetPartReg(self):
         self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(self.lut_w[count])
+        self.send_data2(self.lut_w[:42])
 
         self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(self.lut_b[count])
+        self.send_data2(self.lut_b[:42])
 
     def Init(self):
         if epdconfig.module_init() != 0:
@@ -380,26 +384,7 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert("1")
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     def display(self, image):
         if image == None:
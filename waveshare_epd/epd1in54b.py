@@ -29,6 +29,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 200
@@ -204,39 +205,37 @@ class EPD:
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
 
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.digital_write(self.dc_pin, 1)
+        epdconfig.digital_write(self.cs_pin, 0)
+        epdconfig.spi_writebyte2(data)
+        epdconfig.digital_write(self.cs_pin, 1)
+
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 0:
-            epdconfig.delay_ms(100)
+        epdconfig.digital_wait(self.busy_pin, 1)
         logger.debug("e-Paper busy release")
 
     def set_lut_bw(self):
         self.send_command(0x20)  # vcom
-        for count in range(0, 15):
-            self.send_data(self.lut_vcom0[count])
+        self.send_data2(self.lut_vcom0[:15])
         self.send_command(0x21)  # ww --
-        for count in range(0, 15):
-            self.send_data(self.lut_w[count])
+        self.send_data2(self.lut_w[:15])
         self.send_command(0x22)  # bw r
-        for count in range(0, 15):
-            self.send_data(self.lut_b[count])
+        self.send_data2(self.lut_b[:15])
         self.send_command(0x23)  # wb w
-        for count in range(0, 15):
-            self.send_data(self.lut_g1[count])
+        self.send_data2(self.lut_g1[:15])
         self.send_command(0x24)  # bb b
-        for count in range(0, 15):
-            self.send_data(self.lut_g2[count])
+        self.send_data2(self.lut_g2[:15])
 
     def set_lut_red(self):
         self.send_command(0x25)
-        for count in range(0, 15):
-            self.send_data(self.lut_vcom1[count])
+        self.send_data2(self.lut_vcom1[:15])
         self.send_command(0x26)
-        for count in range(0, 15):
-            self.send_data(self.lut_red0[count])
+        self.send_data2(self.lut_red0[:15])
         self.send_command(0x27)
-        for count in range(0, 15):
-            self.send_data(self.lut_red1[count])
+        self.send_data2(self.lut_red1[:15])
 
     def init(self):
         if epdconfig.module_init() != 0:
@@ -275,11 +274,8 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        buf = [0xFF] * int(self.width * self.height / 8)
-        # Set buffer to value of Python Imaging Library image.
         # Image must be in mode 1.
-        image_monocolor = image.convert("1")
-        imwidth, imheight = image_monocolor.size
+        imwidth, imheight = image.size
         if imwidth != self.width or imheight != self.height:
             raise ValueError(
                 "Image must be same dimensions as display \
@@ -287,14 +283,7 @@ class EPD:
                     self.width, self.height
                 )
             )
-
-        pixels = image_monocolor.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                # Set the bits for the column of pixels at the current position.
-                if pixels[x, y] == 0:
-                    buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     def display(self, blackimage, redimage):
         # send black data
@@ -29,6 +29,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 200
@@ -76,8 +77,7 @@ class EPD:
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 1:
-            epdconfig.delay_ms(100)
+        epdconfig.digital_wait(self.busy_pin, 0)
         logger.debug("e-Paper busy release")
 
     def init(self):
@@ -123,11 +123,8 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        buf = [0xFF] * int(self.width * self.height / 8)
-        # Set buffer to value of Python Imaging Library image.
         # Image must be in mode 1.
-        image_monocolor = image.convert("1")
-        imwidth, imheight = image_monocolor.size
+        imwidth, imheight = image.size
         if imwidth != self.width or imheight != self.height:
             raise ValueError(
                 "Image must be same dimensions as display \
@@ -135,14 +132,7 @@ class EPD:
                     self.width, self.height
                 )
             )
-
-        pixels = image_monocolor.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                # Set the bits for the column of pixels at the current position.
-                if pixels[x, y] == 0:
-                    buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     def display(self, blackimage, redimage):
         if self.width % 8 == 0:
@@ -176,10 +166,10 @@ class EPD:
             linewidth = int(self.width / 8) + 1
 
         self.send_command(0x24)  # DATA_START_TRANSMISSION_1
-        self.send_data2([0xFF] * int(self.height * linewidth))
+        self.send_data2(epdbuffer.filled(0xFF, int(self.height * linewidth)))
 
         self.send_command(0x26)  # DATA_START_TRANSMISSION_2
-        self.send_data2([0x00] * int(self.height * linewidth))
+        self.send_data2(epdbuffer.filled(0x00, int(self.height * linewidth)))
 
         self.send_command(0x22)  # DISPLAY_REFRESH
         self.send_data(0xF7)
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+import numpy as np
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 122
@@ -236,8 +238,7 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def ReadBusy(self):
-        while epdconfig.digital_read(self.busy_pin) == 1:  # 0: idle, 1: busy
-            epdconfig.delay_ms(100)
+        epdconfig.digital_wait(self.busy_pin, 0)  # 0: idle, 1: busy
 
     def TurnOnDisplay(self):
         self.send_command(0x22)
@@ -304,8 +305,7 @@ class EPD:
             self.send_data(self.lut_full_update[75])
 
             self.send_command(0x32)
-            for count in range(70):
-                self.send_data(self.lut_full_update[count])
+            self.send_data2(self.lut_full_update[:70])
 
             self.send_command(0x4E)  # set RAM x address count to 0
             self.send_data(0x00)
@@ -320,8 +320,7 @@ class EPD:
             self.ReadBusy()
 
             self.send_command(0x32)
-            for count in range(70):
-                self.send_data(self.lut_partial_update[count])
+            self.send_data2(self.lut_partial_update[:70])
 
             self.send_command(0x37)
             self.send_data(0x00)
@@ -347,28 +346,15 @@ class EPD:
         else:
             linewidth = int(self.width / 8) + 1
 
-        buf = [0xFF] * (linewidth * self.height)
         image_monocolor = image.convert("1")
         imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-
+        bits = np.ones((self.height, linewidth * 8), dtype=bool)
         if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    if pixels[x, y] == 0:
-                        x = imwidth - x
-                        buf[int(x / 8) + y * linewidth] &= ~(0x80 >> (x % 8))
+            # rows are sent mirrored, offset by one pixel
+            bits[:, 1 : imwidth + 1] = np.asarray(image_monocolor)[:, ::-1]
         elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        newy = imwidth - newy - 1
-                        buf[int(newx / 8) + newy * linewidth] &= ~(0x80 >> (y % 8))
-        return buf
+            bits[:, : self.width] = np.asarray(image_monocolor).T
+        return epdbuffer.pack_1bpp(bits)
 
     def display(self, image):
         self.send_command(0x24)
@@ -408,10 +394,7 @@ class EPD:
             linewidth = int(self.width / 8) + 1
         # logger.debug(linewidth)
 
-        buf = [0x00] * self.height * linewidth
-        for j in range(0, self.height):
-            for i in range(0, linewidth):
-                buf[i + j * linewidth] = color
+        buf = epdbuffer.filled(color, self.height * linewidth)
 
         self.send_command(0x24)
         self.send_data2(buf)
@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 122
@@ -422,8 +423,7 @@ class EPD:
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 1:  # 0: idle, 1: busy
-            epdconfig.delay_ms(10)
+        epdconfig.digital_wait(self.busy_pin, 0)  # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     """
@@ -456,8 +456,7 @@ class EPD:
 
     def Lut(self, lut):
         self.send_command(0x32)
-        for i in range(0, 153):
-            self.send_data(lut[i])
+        self.send_data2(lut[:153])
         self.ReadBusy()
 
     """
@@ -564,25 +563,7 @@ class EPD:
     """
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert("1")
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
-            # return a blank buffer
-            return [0x00] * (int(self.width / 8) * self.height)
-
-        buf = bytearray(img.tobytes("raw"))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     """
     function : Sends the image buffer in RAM to e-Paper and displays
@@ -671,7 +652,7 @@ class EPD:
         # logger.debug(linewidth)
 
         self.send_command(0x24)
-        self.send_data2([color] * int(self.height * linewidth))
+        self.send_data2(epdbuffer.filled(color, int(self.height * linewidth)))
         self.TurnOnDisplay()
 
     """
@@ -29,6 +29,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 122
@@ -79,8 +80,7 @@ class EPD:
     # judge e-Paper whether is busy
     def busy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) != 0:
-            epdconfig.delay_ms(10)
+        epdconfig.digital_wait(self.busy_pin, 0)
         logger.debug("e-Paper busy release")
 
     # set the display window
@@ -147,25 +147,7 @@ class EPD:
 
     # image converted to bytearray
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert("1")
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
-            # return a blank buffer
-            return [0x00] * (int(self.width / 8) * self.height)
-
-        buf = bytearray(img.tobytes("raw"))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     # display image
     def display(self, imageblack, imagered):
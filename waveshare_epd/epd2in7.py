@@ -29,6 +29,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 176
@@ -527,53 +528,48 @@ class EPD:
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
 
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.digital_write(self.dc_pin, 1)
+        epdconfig.digital_write(self.cs_pin, 0)
+        epdconfig.spi_writebyte2(data)
+        epdconfig.digital_write(self.cs_pin, 1)
+
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 0:  #  0: idle, 1: busy
-            epdconfig.delay_ms(200)
+        epdconfig.digital_wait(self.busy_pin, 1)  #  0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def set_lut(self):
         self.send_command(0x20)  # vcom
-        for count in range(0, 44):
-            self.send_data(self.lut_vcom_dc[count])
+        self.send_data2(self.lut_vcom_dc[:44])
         self.send_command(0x21)  # ww --
-        for count in range(0, 42):
-            self.send_data(self.lut_ww[count])
+        self.send_data2(self.lut_ww[:42])
         self.send_command(0x22)  # bw r
-        for count in range(0, 42):
-            self.send_data(self.lut_bw[count])
+        self.send_data2(self.lut_bw[:42])
         self.send_command(0x23)  # wb w
-        for count in range(0, 42):
-            self.send_data(self.lut_bb[count])
+        self.send_data2(self.lut_bb[:42])
         self.send_command(0x24)  # bb b
-        for count in range(0, 42):
-            self.send_data(self.lut_wb[count])
+        self.send_data2(self.lut_wb[:42])
 
     def gray_SetLut(self):
         self.send_command(0x20)
-        for count in range(0, 44):  # vcom
-            self.send_data(self.gray_lut_vcom[count])
+        self.send_data2(self.gray_lut_vcom[:44])  # vcom
 
         self.send_command(0x21)  # red not use
-        for count in range(0, 42):
-            self.send_data(self.gray_lut_ww[count])
+        self.send_data2(self.gray_lut_ww[:42])
 
         self.send_command(0x22)  # bw r
-        for count in range(0, 42):
-            self.send_data(self.gray_lut_bw[count])
+        self.send_data2(self.gray_lut_bw[:42])
 
         self.send_command(0x23)  # wb w
-        for count in range(0, 42):
-            self.send_data(self.gray_lut_wb[count])
+        self.send_data2(self.gray_lut_wb[:42])
 
         self.send_command(0x24)  # bb b
-        for count in range(0, 42):
-            self.send_data(self.gray_lut_bb[count])
+        self.send_data2(self.gray_lut_bb[:42])
 
         self.send_command(0x25)  # vcom
-        for count in range(0, 42):
-            self.send_data(self.gray_lut_ww[count])
+        self.send_data2(self.gray_lut_ww[:42])
 
     def init(self):
         if epdconfig.module_init() != 0:
@@ -717,74 +713,10 @@ class EPD:
         self.send_data(0x57)
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert("1")
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert("L")
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i = 0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((x + (y * self.width)) / 4)] = (
-                            (pixels[x - 3, y] & 0xC0)
-                            | (pixels[x - 2, y] & 0xC0) >> 2
-                            | (pixels[x - 1, y] & 0xC0) >> 4
-                            | (pixels[x, y] & 0xC0) >> 6
-                        )
-
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((newx + (newy * self.width)) / 4)] = (
-                            (pixels[x, y - 3] & 0xC0)
-                            | (pixels[x, y - 2] & 0xC0) >> 2
-                            | (pixels[x, y - 1] & 0xC0) >> 4
-                            | (pixels[x, y] & 0xC0) >> 6
-                        )
-        return buf
+        return epdbuffer.gray4(image, self.width, self.height)
 
     def display(self, image):
         self.send_command(0x10)
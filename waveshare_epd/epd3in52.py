@@ -30,6 +30,7 @@
 import logging
 from multiprocessing.reduction import recv_handle
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 240
@@ -837,25 +838,19 @@ class EPD:
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 0:  #  0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.digital_wait(self.busy_pin, 1)  #  0: busy, 1: idle
         logger.debug("e-Paper busy release")
 
     def lut(self):
-        self.send_command(0x20)  # vcom
-        self.send_data2(self.lut_vcom[:42])
-
-        self.send_command(0x21)  # ww --
-        self.send_data2(self.lut_ww[:42])
-
-        self.send_command(0x22)  # bw r
-        self.send_data2(self.lut_bw[:42])
-
-        self.send_command(0x23)  # wb w
-        self.send_data2(self.lut_bb[:42])
-
-        self.send_command(0x24)  # bb b
-        self.send_data2(self.lut_wb[:42])
+        epdconfig.spi_write_commands(
+            [
+                (0x20, self.lut_vcom[:42]),  # vcom
+                (0x21, self.lut_ww[:42]),  # ww --
+                (0x22, self.lut_bw[:42]),  # bw r
+                (0x23, self.lut_bb[:42]),  # wb w
+                (0x24, self.lut_wb[:42]),  # bb b
+            ]
+        )
 
     def refresh(self):
         self.send_command(0x17)
@@ -940,66 +935,68 @@ class EPD:
         self.Flag = 0
         self.reset()
 
-        self.send_command(0x00)  # panel setting   PSR
-        self.send_data(0xFF)  # RES1 RES0 REG KW/R     UD    SHL   SHD_N  RST_N
-        self.send_data(0x01)  # x x x VCMZ TS_AUTO TIGE NORG VC_LUTZ
-
-        self.send_command(0x01)  # POWER SETTING   PWR
-        self.send_data(0x03)  #  x x x x x x VDS_EN VDG_EN
-        self.send_data(0x10)  #  x x x VCOM_SLWE VGH[3:0]   VGH=20V, VGL=-20V
-        self.send_data(0x3F)  #  x x VSH[5:0]    VSH = 15V
-        self.send_data(0x3F)  #  x x VSL[5:0]    VSL=-15V
-        self.send_data(0x03)  #  OPTEN VDHR[6:0]  VHDR=6.4V
-        # T_VDS_OFF[1:0] 00=1 frame; 01=2 frame; 10=3 frame; 11=4 frame
-        self.send_command(0x06)  # booster soft start   BTST
-        self.send_data(0x37)  #  BT_PHA[7:0]
-        self.send_data(0x3D)  #  BT_PHB[7:0]
-        self.send_data(0x3D)  #  x x BT_PHC[5:0]
-
-        self.send_command(0x60)  # TCON setting            TCON
-        self.send_data(0x22)  # S2G[3:0] G2S[3:0]   non-overlap = 12
-
-        self.send_command(0x82)  # VCOM_DC setting        VDCS
-        self.send_data(0x07)  # x  VDCS[6:0]    VCOM_DC value= -1.9v    00~3f,0x12=-1.9v
-
-        self.send_command(0x30)
-        self.send_data(0x09)
-
-        self.send_command(0xE3)  # power saving            PWS
-        self.send_data(0x88)  # VCOM_W[3:0] SD_W[3:0]
-
-        self.send_command(0x61)  # resoultion setting
-        self.send_data(0xF0)  #  HRES[7:3] 0 0 0
-        self.send_data(0x01)  #  x x x x x x x VRES[8]
-        self.send_data(0x68)  #  VRES[7:0]
-
-        self.send_command(0x50)
-        self.send_data(0xB7)
+        epdconfig.spi_write_commands(
+            [
+                (
+                    0x00,  # panel setting   PSR
+                    [
+                        0xFF,  # RES1 RES0 REG KW/R     UD    SHL   SHD_N  RST_N
+                        0x01,  # x x x VCMZ TS_AUTO TIGE NORG VC_LUTZ
+                    ],
+                ),
+                (
+                    0x01,  # POWER SETTING   PWR
+                    [
+                        0x03,  #  x x x x x x VDS_EN VDG_EN
+                        0x10,  #  x x x VCOM_SLWE VGH[3:0]   VGH=20V, VGL=-20V
+                        0x3F,  #  x x VSH[5:0]    VSH = 15V
+                        0x3F,  #  x x VSL[5:0]    VSL=-15V
+                        0x03,  #  OPTEN VDHR[6:0]  VHDR=6.4V
+                    ],
+                ),
+                # T_VDS_OFF[1:0] 00=1 frame; 01=2 frame; 10=3 frame; 11=4 frame
+                (
+                    0x06,  # booster soft start   BTST
+                    [
+                        0x37,  #  BT_PHA[7:0]
+                        0x3D,  #  BT_PHB[7:0]
+                        0x3D,  #  x x BT_PHC[5:0]
+                    ],
+                ),
+                (
+                    0x60,  # TCON setting            TCON
+                    [
+                        0x22,  # S2G[3:0] G2S[3:0]   non-overlap = 12
+                    ],
+                ),
+                (
+                    0x82,  # VCOM_DC setting        VDCS
+                    [
+                        0x07,  # x  VDCS[6:0]    VCOM_DC value= -1.9v    00~3f,0x12=-1.9v
+                    ],
+                ),
+                (0x30, [0x09]),
+                (
+                    0xE3,  # power saving            PWS
+                    [
+                        0x88,  # VCOM_W[3:0] SD_W[3:0]
+                    ],
+                ),
+                (
+                    0x61,  # resoultion setting
+                    [
+                        0xF0,  #  HRES[7:3] 0 0 0
+                        0x01,  #  x x x x x x x VRES[8]
+                        0x68,  #  VRES[7:0]
+                    ],
+                ),
+                (0x50, [0xB7]),
+            ]
+        )
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert("1")
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     def display(self, image):
         if image == None:
@@ -1081,7 +1078,7 @@ class EPD:
     def Clear(self):
         self.send_command(0x13)
         # Transfer new data
-        self.send_data2([0xFF] * int(self.width * self.height / 8))
+        self.send_data2(epdbuffer.filled(0xFF, int(self.width * self.height / 8)))
         self.lut_GC()
         self.refresh()
 
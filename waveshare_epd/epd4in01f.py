@@ -31,6 +31,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 640
@@ -85,14 +86,12 @@ class EPD:
 
     def ReadBusyHigh(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 0:  # 0: idle, 1: busy
-            epdconfig.delay_ms(10)
+        epdconfig.digital_wait(self.busy_pin, 1)  # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def ReadBusyLow(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 1:  # 0: idle, 1: busy
-            epdconfig.delay_ms(10)
+        epdconfig.digital_wait(self.busy_pin, 0)  # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def init(self):
@@ -102,148 +101,33 @@ class EPD:
         self.reset()
 
         self.ReadBusyHigh()
-        self.send_command(0x00)
-        self.send_data(0x2F)
-        self.send_data(0x00)
-        self.send_command(0x01)
-        self.send_data(0x37)
-        self.send_data(0x00)
-        self.send_data(0x05)
-        self.send_data(0x05)
-        self.send_command(0x03)
-        self.send_data(0x00)
-        self.send_command(0x06)
-        self.send_data(0xC7)
-        self.send_data(0xC7)
-        self.send_data(0x1D)
-        self.send_command(0x41)
-        self.send_data(0x00)
-        self.send_command(0x50)
-        self.send_data(0x37)
-        self.send_command(0x60)
-        self.send_data(0x22)
-        self.send_command(0x61)
-        self.send_data(0x02)
-        self.send_data(0x80)
-        self.send_data(0x01)
-        self.send_data(0x90)
-        self.send_command(0xE3)
-        self.send_data(0xAA)
+        epdconfig.spi_write_commands(
+            [
+                (0x00, [0x2F, 0x00]),
+                (0x01, [0x37, 0x00, 0x05, 0x05]),
+                (0x03, [0x00]),
+                (0x06, [0xC7, 0xC7, 0x1D]),
+                (0x41, [0x00]),
+                (0x50, [0x37]),
+                (0x60, [0x22]),
+                (0x61, [0x02, 0x80, 0x01, 0x90]),
+                (0xE3, [0xAA]),
+            ]
+        )
 
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
-        buf = [0x00] * int(self.width * self.height / 2)
-        image_monocolor = image.convert("RGB")  # Picture mode conversion
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        logger.debug("imwidth = %d  imheight =  %d ", imwidth, imheight)
-        if imwidth == self.width and imheight == self.height:
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    Add = int((x + y * self.width) / 2)
-                    Color = 0
-                    if (
-                        pixels[x, y][0] == 0
-                        and pixels[x, y][1] == 0
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 0
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 255
-                        and pixels[x, y][2] == 255
-                    ):
-                        Color = 1
-                    elif (
-                        pixels[x, y][0] == 0
-                        and pixels[x, y][1] == 255
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 2
-                    elif (
-                        pixels[x, y][0] == 0
-                        and pixels[x, y][1] == 0
-                        and pixels[x, y][2] == 255
-                    ):
-                        Color = 3
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 0
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 4
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 255
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 5
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 128
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 6
-
-                    data_t = buf[Add] & (~(0xF0 >> ((x % 2) * 4)))
-                    buf[Add] = data_t | ((Color << 4) >> ((x % 2) * 4))
-
-        elif imwidth == self.height and imheight == self.width:
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    Add = int((newx + newy * self.width) / 2)
-                    Color = 0
-                    if (
-                        pixels[x, y][0] == 0
-                        and pixels[x, y][1] == 0
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 0
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 255
-                        and pixels[x, y][2] == 255
-                    ):
-                        Color = 1
-                    elif (
-                        pixels[x, y][0] == 0
-                        and pixels[x, y][1] == 255
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 2
-                    elif (
-                        pixels[x, y][0] == 0
-                        and pixels[x, y][1] == 0
-                        and pixels[x, y][2] == 255
-                    ):
-                        Color = 3
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 0
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 4
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 255
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 5
-                    elif (
-                        pixels[x, y][0] == 255
-                        and pixels[x, y][1] == 128
-                        and pixels[x, y][2] == 0
-                    ):
-                        Color = 6
-
-                    data_t = buf[Add] & (~(0xF0 >> ((newx % 2) * 4)))
-                    buf[Add] = data_t | ((Color << 4) >> ((newx % 2) * 4))
-        return buf
+        image_temp = epdbuffer.orient(image, self.width, self.height)
+        if image_temp is None:
+            return bytes(int(self.width * self.height / 2))
+        # Pixels that are not exactly one of the 7 colors are sent as black
+        indices = epdbuffer.color_indices(
+            image_temp,
+            (0x000000, 0xFFFFFF, 0x00FF00, 0x0000FF, 0xFF0000, 0xFFFF00, 0xFF8000),
+        )
+        return epdbuffer.pack_4bpp(indices)
 
     def display(self, image):
         self.send_command(0x61)  # Set Resolution setting
@@ -268,7 +152,7 @@ class EPD:
         self.send_data(0x01)
         self.send_data(0x90)
         self.send_command(0x10)
-        self.send_data2([0x11] * int(EPD_HEIGHT) * int(EPD_WIDTH / 2))
+        self.send_data2(epdbuffer.filled(0x11, int(EPD_HEIGHT) * int(EPD_WIDTH / 2)))
         # BLACK   0x00    /// 0000
         # WHITE   0x11    /// 0001
         # GREEN   0x22    /// 0010
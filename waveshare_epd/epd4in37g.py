@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 import PIL
 from PIL import Image
@@ -78,14 +79,12 @@ class EPD:
 
     def ReadBusyH(self):
         logger.debug("e-Paper busy H")
-        while epdconfig.digital_read(self.busy_pin) == 0:  # 0: idle, 1: busy
-            epdconfig.delay_ms(5)
+        epdconfig.digital_wait(self.busy_pin, 1)  # 0: idle, 1: busy
         logger.debug("e-Paper busy H release")
 
     def ReadBusyL(self):
         logger.debug("e-Paper busy L")
-        while epdconfig.digital_read(self.busy_pin) == 1:  # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.digital_wait(self.busy_pin, 0)  # 0: busy, 1: idle
         logger.debug("e-Paper busy L release")
 
     def TurnOnDisplay(self):
@@ -179,33 +178,15 @@ class EPD:
         )
 
         # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if imwidth == self.width and imheight == self.height:
-            image_temp = image
-        elif imwidth == self.height and imheight == self.width:
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning(
-                "Invalid image dimensions: %d x %d, expected %d x %d"
-                % (imwidth, imheight, self.width, self.height)
-            )
+        image_temp = epdbuffer.orient(image, self.width, self.height)
+        if image_temp is None:
+            return bytearray([0x55]) * ((self.width + 3) // 4 * self.height)
 
         # Convert the soruce image to the 4 colors, dithering if needed
         image_4color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_4color = bytearray(image_4color.tobytes("raw"))
-
-        # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 4)
-        idx = 0
-        for i in range(0, len(buf_4color), 4):
-            buf[idx] = (
-                (buf_4color[i] << 6)
-                + (buf_4color[i + 1] << 4)
-                + (buf_4color[i + 2] << 2)
-                + buf_4color[i + 3]
-            )
-            idx += 1
-        return buf
+
+        # pack 4 pixels into a single byte to transfer to the panel
+        return epdbuffer.pack_2bpp(image_4color)
 
     def display(self, image):
         if self.width % 4 == 0:
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+import numpy as np
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 600
@@ -70,8 +72,7 @@ class EPD:
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 0:  # 0: idle, 1: busy
-            epdconfig.delay_ms(100)
+        epdconfig.digital_wait(self.busy_pin, 1)  # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def init(self):
@@ -124,39 +125,11 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        buf = [0x00] * int(self.width * self.height / 4)
-        image_monocolor = image.convert("1")
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        logger.debug("imwidth = %d  imheight =  %d ", imwidth, imheight)
-        if imwidth == self.width and imheight == self.height:
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] < 64:  # black
-                        buf[int((x + y * self.width) / 4)] &= ~(0xC0 >> (x % 4 * 2))
-                    elif pixels[x, y] < 192:  # convert gray to red
-                        buf[int((x + y * self.width) / 4)] &= ~(0xC0 >> (x % 4 * 2))
-                        buf[int((x + y * self.width) / 4)] |= 0x40 >> (x % 4 * 2)
-                    else:  # white
-                        buf[int((x + y * self.width) / 4)] |= 0xC0 >> (x % 4 * 2)
-        elif imwidth == self.height and imheight == self.width:
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] < 64:  # black
-                        buf[int((newx + newy * self.width) / 4)] &= ~(
-                            0xC0 >> (y % 4 * 2)
-                        )
-                    elif pixels[x, y] < 192:  # convert gray to red
-                        buf[int((newx + newy * self.width) / 4)] &= ~(
-                            0xC0 >> (y % 4 * 2)
-                        )
-                        buf[int((newx + newy * self.width) / 4)] |= 0x40 >> (y % 4 * 2)
-                    else:  # white
-                        buf[int((newx + newy * self.width) / 4)] |= 0xC0 >> (y % 4 * 2)
-        return buf
+        image_monocolor = epdbuffer.orient(image.convert("1"), self.width, self.height)
+        if image_monocolor is None:
+            return bytearray(int(self.width * self.height / 4))
+        # 2 bits per pixel, black is 00 and white is 11
+        return epdbuffer.pack_2bpp(np.where(np.asarray(image_monocolor), 3, 0))
 
     def display(self, image):
         self.send_command(0x10)
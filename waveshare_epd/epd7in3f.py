@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 import PIL
 from PIL import Image
@@ -38,6 +39,9 @@ import io
 # Display resolution
 EPD_WIDTH = 800
 EPD_HEIGHT = 480
+# SPI profile of the panel, epdconfig.spi_profile overrides it. The panel keeps the board
+# clock by default, raise it with spi_profile(speed_hz=...), e.g. --spi-speed 10000000
+SPI_PROFILE = {}
 
 logger = logging.getLogger(__name__)
 
@@ -88,8 +92,7 @@ class EPD:
 
     def ReadBusyH(self):
         logger.debug("e-Paper busy H")
-        while epdconfig.digital_read(self.busy_pin) == 0:  # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.digital_wait(self.busy_pin, 1)  # 0: busy, 1: idle
         logger.debug("e-Paper busy H release")
 
     def TurnOnDisplay(self):
@@ -105,97 +108,36 @@ class EPD:
         self.ReadBusyH()
 
     def init(self):
-        if epdconfig.module_init() != 0:
+        if epdconfig.module_init(SPI_PROFILE) != 0:
             return -1
         # EPD hardware init start
         self.reset()
         self.ReadBusyH()
         epdconfig.delay_ms(30)
 
-        self.send_command(0xAA)  # CMDH
-        self.send_data(0x49)
-        self.send_data(0x55)
-        self.send_data(0x20)
-        self.send_data(0x08)
-        self.send_data(0x09)
-        self.send_data(0x18)
-
-        self.send_command(0x01)
-        self.send_data(0x3F)
-        self.send_data(0x00)
-        self.send_data(0x32)
-        self.send_data(0x2A)
-        self.send_data(0x0E)
-        self.send_data(0x2A)
-
-        self.send_command(0x00)
-        self.send_data(0x5F)
-        self.send_data(0x69)
-
-        self.send_command(0x03)
-        self.send_data(0x00)
-        self.send_data(0x54)
-        self.send_data(0x00)
-        self.send_data(0x44)
-
-        self.send_command(0x05)
-        self.send_data(0x40)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x2C)
-
-        self.send_command(0x06)
-        self.send_data(0x6F)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x22)
-
-        self.send_command(0x08)
-        self.send_data(0x6F)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x22)
-
-        self.send_command(0x13)  # IPC
-        self.send_data(0x00)
-        self.send_data(0x04)
-
-        self.send_command(0x30)
-        self.send_data(0x3C)
-
-        self.send_command(0x41)  # TSE
-        self.send_data(0x00)
-
-        self.send_command(0x50)
-        self.send_data(0x3F)
-
-        self.send_command(0x60)
-        self.send_data(0x02)
-        self.send_data(0x00)
-
-        self.send_command(0x61)
-        self.send_data(0x03)
-        self.send_data(0x20)
-        self.send_data(0x01)
-        self.send_data(0xE0)
-
-        self.send_command(0x82)
-        self.send_data(0x1E)
-
-        self.send_command(0x84)
-        self.send_data(0x00)
-
-        self.send_command(0x86)  # AGID
-        self.send_data(0x00)
-
-        self.send_command(0xE3)
-        self.send_data(0x2F)
-
-        self.send_command(0xE0)  # CCSET
-        self.send_data(0x00)
-
-        self.send_command(0xE6)  # TSSET
-        self.send_data(0x00)
+        epdconfig.spi_write_commands(
+            [
+                (0xAA, [0x49, 0x55, 0x20, 0x08, 0x09, 0x18]),  # CMDH
+                (0x01, [0x3F, 0x00, 0x32, 0x2A, 0x0E, 0x2A]),
+                (0x00, [0x5F, 0x69]),
+                (0x03, [0x00, 0x54, 0x00, 0x44]),
+                (0x05, [0x40, 0x1F, 0x1F, 0x2C]),
+                (0x06, [0x6F, 0x1F, 0x1F, 0x22]),
+                (0x08, [0x6F, 0x1F, 0x1F, 0x22]),
+                (0x13, [0x00, 0x04]),  # IPC
+                (0x30, [0x3C]),
+                (0x41, [0x00]),  # TSE
+                (0x50, [0x3F]),
+                (0x60, [0x02, 0x00]),
+                (0x61, [0x03, 0x20, 0x01, 0xE0]),
+                (0x82, [0x1E]),
+                (0x84, [0x00]),
+                (0x86, [0x00]),  # AGID
+                (0xE3, [0x2F]),
+                (0xE0, [0x00]),  # CCSET
+                (0xE6, [0x00]),  # TSSET
+            ]
+        )
         return 0
 
     def getbuffer(self, image):
@@ -229,31 +171,18 @@ class EPD:
         )
 
         # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if imwidth == self.width and imheight == self.height:
-            image_temp = image
-        elif imwidth == self.height and imheight == self.width:
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning(
-                "Invalid image dimensions: %d x %d, expected %d x %d"
-                % (imwidth, imheight, self.width, self.height)
-            )
+        image_temp = epdbuffer.orient(image, self.width, self.height)
+        if image_temp is None:
+            return bytes(int(self.width * self.height / 2))
 
         # Convert the soruce image to the 7 colors, dithering if needed
         image_7color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_7color = bytearray(image_7color.tobytes("raw"))
 
         # PIL does not support 4 bit color, so pack the 4 bits of color
         # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 2)
-        idx = 0
-        for i in range(0, len(buf_7color), 2):
-            buf[idx] = (buf_7color[i] << 4) + buf_7color[i + 1]
-            idx += 1
-
-        return buf
+        return epdbuffer.pack_4bpp(image_7color)
 
+    # image is a buffer from getbuffer or an already packed 4 bit framebuffer
     def display(self, image):
         self.send_command(0x10)
         self.send_data2(image)
@@ -262,16 +191,18 @@ class EPD:
 
     def Clear(self, color=0x11):
         self.send_command(0x10)
-        self.send_data2([color] * int(self.height) * int(self.width / 2))
+        self.send_data2(epdbuffer.filled(color, int(self.height) * int(self.width / 2)))
 
         self.TurnOnDisplay()
 
-    def sleep(self):
+    # release=False keeps SPI and GPIO open for the next init, e.g. in a long running service
+    def sleep(self, release=True):
         self.send_command(0x07)  # DEEP_SLEEP
         self.send_data(0xA5)
 
         epdconfig.delay_ms(2000)
-        epdconfig.module_exit()
+        if release:
+            epdconfig.module_exit()
 
 
 ### END OF FILE ###
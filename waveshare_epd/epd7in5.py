@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+import numpy as np
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 640
@@ -76,8 +78,7 @@ class EPD:
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while epdconfig.digital_read(self.busy_pin) == 0:  # 0: idle, 1: busy
-            epdconfig.delay_ms(100)
+        epdconfig.digital_wait(self.busy_pin, 1)  # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def init(self):
@@ -126,43 +127,11 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        halfwidth = int(self.width / 2)
-        buf = [0x33] * halfwidth * self.height
-
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            img = img.rotate(90, expand=True).convert("1")
-            imwidth, imheight = img.size
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
-            # return a blank buffer
-            return buf
-
-        pixels = img.load()
-
-        for y in range(imheight):
-            offset = y * halfwidth
-            for x in range(1, imwidth, 2):
-                i = offset + x // 2
-                if pixels[x - 1, y] > 191:
-                    if pixels[x, y] > 191:
-                        buf[i] = 0x33
-                    else:
-                        buf[i] = 0x30
-                else:
-                    if pixels[x, y] > 191:
-                        buf[i] = 0x03
-                    else:
-                        buf[i] = 0x00
-        return buf
+        image_monocolor = epdbuffer.orient(image.convert("1"), self.width, self.height)
+        if image_monocolor is None:
+            return bytearray([0x33]) * int(self.width * self.height / 2)
+        # 4 bits per pixel, black is 0x0 and white is 0x3
+        return epdbuffer.pack_4bpp(np.where(np.asarray(image_monocolor), 3, 0))
 
     def display(self, image):
         self.send_command(0x10)
@@ -172,7 +141,7 @@ class EPD:
         self.ReadBusy()
 
     def Clear(self):
-        buf = [0x33] * int(self.width * self.height / 2)
+        buf = epdbuffer.filled(0x33, int(self.width * self.height / 2))
         self.send_command(0x10)
         self.send_data2(buf)
         self.send_command(0x12)
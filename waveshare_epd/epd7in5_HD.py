@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 880
@@ -76,9 +77,7 @@ class EPD:
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while busy == 1:
-            busy = epdconfig.digital_read(self.busy_pin)
+        epdconfig.digital_wait(self.busy_pin, 0)
         epdconfig.delay_ms(200)
 
     def init(self):
@@ -141,24 +140,7 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            img = img.rotate(90, expand=True).convert("1")
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
-            # return a blank buffer
-            return [0xFF] * int(self.width * self.height / 8)
-
-        buf = bytearray(img.tobytes("raw"))
-        return buf
+        return epdbuffer.monochrome(image, self.width, self.height)
 
     def display(self, image):
         self.send_command(0x4F)
@@ -173,7 +155,7 @@ class EPD:
         self.ReadBusy()
 
     def Clear(self):
-        buf = [0xFF] * int(self.width * self.height / 8)
+        buf = epdbuffer.filled(0xFF, int(self.width * self.height / 8))
         self.send_command(0x4F)
         self.send_data2([0x00, 0x00])
         self.send_command(0x24)
@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 800
@@ -71,7 +72,7 @@ class EPD:
     def send_data2(self, data):
         epdconfig.digital_write(self.dc_pin, 1)
         epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
+        epdconfig.spi_writebyte2(data)
         epdconfig.digital_write(self.cs_pin, 1)
 
     def ReadBusy(self):
@@ -90,68 +91,61 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0x06)  # btst
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x28)  # If an exception is displayed, try using 0x38
-        self.send_data(0x17)
-
-        self.send_command(0x01)  # POWER SETTING
-        self.send_data(0x07)
-        self.send_data(0x07)  # VGH=20V,VGL=-20V
-        self.send_data(0x3F)  # VDH=15V
-        self.send_data(0x3F)  # VDL=-15V
-
-        self.send_command(0x04)  # POWER ON
+        epdconfig.spi_write_commands(
+            [
+                (
+                    0x06,  # btst
+                    [
+                        0x17,
+                        0x17,
+                        0x28,  # If an exception is displayed, try using 0x38
+                        0x17,
+                    ],
+                ),
+                (
+                    0x01,  # POWER SETTING
+                    [
+                        0x07,
+                        0x07,  # VGH=20V,VGL=-20V
+                        0x3F,  # VDH=15V
+                        0x3F,  # VDL=-15V
+                    ],
+                ),
+                (0x04, []),  # POWER ON
+            ]
+        )
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
-        self.send_command(0x00)  # PANNEL SETTING
-        self.send_data(0x1F)  # KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        self.send_command(0x61)  # tres
-        self.send_data(0x03)  # source 800
-        self.send_data(0x20)
-        self.send_data(0x01)  # gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0x15)
-        self.send_data(0x00)
-
-        self.send_command(0x50)  # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x10)
-        self.send_data(0x07)
-
-        self.send_command(0x60)  # TCON SETTING
-        self.send_data(0x22)
+        epdconfig.spi_write_commands(
+            [
+                (
+                    0x00,  # PANNEL SETTING
+                    [
+                        0x1F,  # KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+                    ],
+                ),
+                (
+                    0x61,  # tres
+                    [
+                        0x03,  # source 800
+                        0x20,
+                        0x01,  # gate 480
+                        0xE0,
+                    ],
+                ),
+                (0x15, [0x00]),
+                (0x50, [0x10, 0x07]),  # VCOM AND DATA INTERVAL SETTING
+                (0x60, [0x22]),  # TCON SETTING
+            ]
+        )
 
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert("1")
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
-            # return a blank buffer
-            return [0x00] * (int(self.width / 8) * self.height)
-
-        buf = bytearray(img.tobytes("raw"))
-        # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
-        # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        # the panel expects 1 for black, the inverse of PIL mode 1
+        return epdbuffer.monochrome(image, self.width, self.height, invert=True)
 
     def display(self, image):
         self.send_command(0x13)
@@ -162,7 +156,7 @@ class EPD:
         self.ReadBusy()
 
     def Clear(self):
-        buf = [0x00] * (int(self.width / 8) * self.height)
+        buf = epdbuffer.filled(0x00, int(self.width / 8) * self.height)
         self.send_command(0x10)
         self.send_data2(buf)
         self.send_command(0x13)
@@ -30,6 +30,7 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
 
 # Display resolution
 EPD_WIDTH = 800
@@ -320,25 +321,15 @@ class EPD:
         logger.debug("e-Paper busy release")
 
     def SetLut(self, lut_vcom, lut_ww, lut_bw, lut_wb, lut_bb):
-        self.send_command(0x20)
-        for count in range(0, 42):
-            self.send_data(lut_vcom[count])
-
-        self.send_command(0x21)
-        for count in range(0, 42):
-            self.send_data(lut_ww[count])
-
-        self.send_command(0x22)
-        for count in range(0, 42):
-            self.send_data(lut_bw[count])
-
-        self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(lut_wb[count])
-
-        self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(lut_bb[count])
+        epdconfig.spi_write_commands(
+            [
+                (0x20, lut_vcom[:42]),
+                (0x21, lut_ww[:42]),
+                (0x22, lut_bw[:42]),
+                (0x23, lut_wb[:42]),
+                (0x24, lut_bb[:42]),
+            ]
+        )
 
     def init(self):
         if epdconfig.module_init() != 0:
@@ -358,53 +349,68 @@ class EPD:
         # self.send_data(0x3f)		#VDH=15V
         # self.send_data(0x3f)		#VDL=-15V
 
-        self.send_command(0x01)  # power setting
-        self.send_data(0x17)  # 1-0=11: internal power
-        self.send_data(self.Voltage_Frame_7IN5_V2[6])  # VGH&VGL
-        self.send_data(self.Voltage_Frame_7IN5_V2[1])  # VSH
-        self.send_data(self.Voltage_Frame_7IN5_V2[2])  # VSL
-        self.send_data(self.Voltage_Frame_7IN5_V2[3])  # VSHR
-
-        self.send_command(0x82)  # VCOM DC Setting
-        self.send_data(self.Voltage_Frame_7IN5_V2[4])  # VCOM
-
-        self.send_command(0x06)  # Booster Setting
-        self.send_data(0x27)
-        self.send_data(0x27)
-        self.send_data(0x2F)
-        self.send_data(0x17)
-
-        self.send_command(0x30)  # OSC Setting
-        self.send_data(self.Voltage_Frame_7IN5_V2[0])  # 3C=50Hz, 3A=100HZ
-
-        self.send_command(0x04)  # POWER ON
+        epdconfig.spi_write_commands(
+            [
+                (
+                    0x01,  # power setting
+                    [
+                        0x17,  # 1-0=11: internal power
+                        self.Voltage_Frame_7IN5_V2[6],  # VGH&VGL
+                        self.Voltage_Frame_7IN5_V2[1],  # VSH
+                        self.Voltage_Frame_7IN5_V2[2],  # VSL
+                        self.Voltage_Frame_7IN5_V2[3],  # VSHR
+                    ],
+                ),
+                (
+                    0x82,  # VCOM DC Setting
+                    [
+                        self.Voltage_Frame_7IN5_V2[4],  # VCOM
+                    ],
+                ),
+                (0x06, [0x27, 0x27, 0x2F, 0x17]),  # Booster Setting
+                (
+                    0x30,  # OSC Setting
+                    [
+                        self.Voltage_Frame_7IN5_V2[0],  # 3C=50Hz, 3A=100HZ
+                    ],
+                ),
+                (0x04, []),  # POWER ON
+            ]
+        )
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
-        self.send_command(0x00)  # PANNEL SETTING
-        self.send_data(0x3F)  # KW-3f KWR-2F BWROTP-0f BWOTP-1f
-
-        self.send_command(0x61)  # tres
-        self.send_data(0x03)  # source 800
-        self.send_data(0x20)
-        self.send_data(0x01)  # gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0x15)
-        self.send_data(0x00)
-
-        self.send_command(0x50)  # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x10)
-        self.send_data(0x07)
-
-        self.send_command(0x60)  # TCON SETTING
-        self.send_data(0x22)
-
-        self.send_command(0x65)  # Resolution setting
-        self.send_data(0x00)
-        self.send_data(0x00)  # 800*480
-        self.send_data(0x00)
-        self.send_data(0x00)
+        epdconfig.spi_write_commands(
+            [
+                (
+                    0x00,  # PANNEL SETTING
+                    [
+                        0x3F,  # KW-3f KWR-2F BWROTP-0f BWOTP-1f
+                    ],
+                ),
+                (
+                    0x61,  # tres
+                    [
+                        0x03,  # source 800
+                        0x20,
+                        0x01,  # gate 480
+                        0xE0,
+                    ],
+                ),
+                (0x15, [0x00]),
+                (0x50, [0x10, 0x07]),  # VCOM AND DATA INTERVAL SETTING
+                (0x60, [0x22]),  # TCON SETTING
+                (
+                    0x65,  # Resolution setting
+                    [
+                        0x00,
+                        0x00,  # 800*480
+                        0x00,
+                        0x00,
+                    ],
+                ),
+            ]
+        )
 
         self.SetLut(
             self.LUT_VCOM_7IN5_V2,
@@ -417,29 +423,8 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert("1")
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
-            # return a blank buffer
-            return [0x00] * (int(self.width / 8) * self.height)
-
-        buf = bytearray(img.tobytes("raw"))
-        # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
-        # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        # the panel expects 1 for black, the inverse of PIL mode 1
+        return epdbuffer.monochrome(image, self.width, self.height, invert=True)
 
     def display(self, image):
         self.send_command(0x13)
@@ -450,7 +435,7 @@ class EPD:
         self.ReadBusy()
 
     def Clear(self):
-        buf = [0x00] * (int(self.width / 8) * self.height)
+        buf = epdbuffer.filled(0x00, int(self.width / 8) * self.height)
         self.send_command(0x10)
         self.send_data2(buf)
         self.send_command(0x13)
@@ -0,0 +1,91 @@
+# *****************************************************************************
+# * | File        :	  epdbuffer.py
+# * | Function    :   Vectorised framebuffer packing shared by the drivers
+# * | Info        :
+# *----------------
+# ******************************************************************************
+
+import functools
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def orient(image, width, height):
+    """Return the image in panel orientation, rotating portrait images, or None if it does not fit."""
+    imwidth, imheight = image.size
+    if imwidth == width and imheight == height:
+        return image
+    if imwidth == height and imheight == width:
+        return image.rotate(90, expand=True)
+    logger.warning(
+        "Invalid image dimensions: %d x %d, expected %d x %d"
+        % (imwidth, imheight, width, height)
+    )
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def filled(value, size):
+    """Return size bytes of value, shared between calls so the panels can be cleared without rebuilding it."""
+    return bytes([value]) * size
+
+
+def monochrome(image, width, height, invert=False):
+    """Dither the image to 1 bit and pack it, white is 1 unless inverted. Ill-fitting images give a white buffer."""
+    image_monocolor = orient(image.convert("1"), width, height)
+    if image_monocolor is None:
+        bits = np.ones((height, width), dtype=bool)
+    else:
+        bits = np.asarray(image_monocolor)
+    return pack_1bpp(~bits if invert else bits)
+
+
+def gray4(image, width, height):
+    """Pack the image to the 2 bit levels of the 4 gray waveforms. Ill-fitting images give a white buffer."""
+    image_gray = orient(image.convert("L"), width, height)
+    if image_gray is None:
+        return bytearray([0xFF]) * (-(-width // 4) * height)
+    pixels = np.asarray(image_gray)
+    levels = pixels >> 6
+    levels[pixels == 0xC0] = 2
+    levels[pixels == 0x80] = 1
+    return pack_2bpp(levels)
+
+
+def color_indices(image, palette):
+    """Map every pixel matching a palette colour exactly to its index, all other pixels to 0."""
+    rgb = np.asarray(image.convert("RGB"), dtype=np.uint32)
+    keys = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    indices = np.zeros(keys.shape, dtype=np.uint8)
+    for index, color in enumerate(palette):
+        indices[keys == color] = index
+    return indices
+
+
+def pack_1bpp(bits):
+    """Pack boolean rows 8 pixels per byte, the first pixel in the high bit, rows padded with 1 bits."""
+    bits = np.asarray(bits, dtype=bool)
+    height, width = bits.shape
+    padded = np.ones((height, -(-width // 8) * 8), dtype=bool)
+    padded[:, :width] = bits
+    return bytearray(np.packbits(padded, axis=1).tobytes())
+
+
+def pack_2bpp(levels):
+    """Pack 2 bit values of each row 4 per byte, the first pixel in the high bits, rows padded with 0."""
+    levels = np.asarray(levels, dtype=np.uint8)
+    height, width = levels.shape
+    padded = np.zeros((height, -(-width // 4) * 4), dtype=np.uint8)
+    padded[:, :width] = levels
+    quads = padded.reshape(height, -1, 4)
+    packed = (quads[..., 0] << 6) | (quads[..., 1] << 4) | (quads[..., 2] << 2) | quads[..., 3]
+    return bytearray(packed.tobytes())
+
+
+def pack_4bpp(indices):
+    """Pack palette indices two per byte, the first pixel in the high nibble."""
+    flat = np.ascontiguousarray(indices, dtype=np.uint8).reshape(-1)
+    return ((flat[0::2] << 4) | flat[1::2]).tobytes()
@@ -34,14 +34,135 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# longest refresh a panel may keep BUSY asserted before digital_wait gives up
+BUSY_TIMEOUT_MS = 120000
+# longest single edge wait, bounds the delay when the edge fires between
+# reading the pin and arming the edge detection
+EDGE_SLICE_MS = 100
+
+
+def _wait_for_level(gpio, read, pin, value, timeout_ms):
+    """Block until read(pin) returns value, sleeping on the pin edge in between."""
+    edge = gpio.RISING if value else gpio.FALLING
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    while read(pin) != value:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            logger.warning(
+                "Timed out after %d ms waiting for pin %d to read %d"
+                % (timeout_ms, pin, value)
+            )
+            return False
+        try:
+            gpio.wait_for_edge(pin, edge, timeout=min(remaining_ms, EDGE_SLICE_MS))
+        except RuntimeError:
+            # edge detection is unavailable on this pin, poll instead
+            time.sleep(0.005)
+    return True
+
+
+def _byte_view(data):
+    """Return a flat memoryview over bytes-like and uint8 buffers, lists as they are."""
+    try:
+        view = memoryview(data)
+    except TypeError:
+        return data
+    if view.itemsize == 1 and view.c_contiguous:
+        return view.cast("B")
+    return data
+
+
+def _byte_chunks(data, size):
+    """Yield slices of at most size bytes, zero copy for buffers."""
+    data = _byte_view(data)
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def _write_commands(board, commands):
+    """Send (command, parameters) pairs, the command byte with DC low and its
+    parameters as one chip select framed transfer with DC high."""
+    for command, data in commands:
+        board.digital_write(board.DC_PIN, 0)
+        board.digital_write(board.CS_PIN, 0)
+        board.spi_writebyte([command])
+        board.digital_write(board.CS_PIN, 1)
+        if len(data) > 0:
+            board.digital_write(board.DC_PIN, 1)
+            board.digital_write(board.CS_PIN, 0)
+            board.spi_writebyte2(data)
+            board.digital_write(board.CS_PIN, 1)
+
+
+class _SpidevProfile:
+    # SPI profile of the board, drivers pass their own to module_init and
+    # spi_profile overrides both, e.g. from the command line
+    SPI_SPEED_HZ = 4000000
+    SPI_MODE = 0b00
+    # largest single spidev transfer, the default bufsiz of the kernel driver
+    SPI_CHUNK = 4096
+
+    def spi_profile(self, speed_hz=None, mode=None, chunk=None, validate=False):
+        """Override the SPI clock, mode and chunk size of every panel.
+
+        With validate a clock above the board default is only used if a loopback
+        transfer at that clock reads back unchanged, which needs MOSI wired to MISO.
+        """
+        for key, value in (("speed_hz", speed_hz), ("mode", mode), ("chunk", chunk)):
+            if value is not None:
+                self._spi_overrides[key] = value
+        self._spi_overrides["validate"] = validate
+
+    def spi_loopback(self, speed_hz, size=256):
+        """Send a random pattern at speed_hz, True if it reads back unchanged."""
+        pattern = os.urandom(size)
+        previous = self.SPI.max_speed_hz
+        self.SPI.max_speed_hz = speed_hz
+        try:
+            received = self.SPI.xfer3(list(pattern))
+        finally:
+            self.SPI.max_speed_hz = previous
+        return bytes(received) == pattern
+
+    def _apply_spi_profile(self, profile):
+        settings = {
+            "speed_hz": self.SPI_SPEED_HZ,
+            "mode": self.SPI_MODE,
+            "chunk": self.SPI_CHUNK,
+            "validate": False,
+        }
+        settings.update(profile or {})
+        settings.update(self._spi_overrides)
+
+        self.SPI.mode = settings["mode"]
+        self.SPI.max_speed_hz = self.SPI_SPEED_HZ
+        speed_hz = settings["speed_hz"]
+        if (
+            settings["validate"]
+            and speed_hz > self.SPI_SPEED_HZ
+            and not self.spi_loopback(speed_hz)
+        ):
+            logger.warning(
+                "SPI loopback failed at %d Hz, staying at %d Hz"
+                % (speed_hz, self.SPI_SPEED_HZ)
+            )
+            speed_hz = self.SPI_SPEED_HZ
+        self.SPI.max_speed_hz = speed_hz
+        self._spi_chunk = settings["chunk"]
+        logger.debug(
+            "SPI at %d Hz, mode %d, %d byte chunks"
+            % (speed_hz, settings["mode"], self._spi_chunk)
+        )
+
 
-class RaspberryPi:
+class RaspberryPi(_SpidevProfile):
     # Pin definition
     RST_PIN = 17
     DC_PIN = 25
     CS_PIN = 8
     BUSY_PIN = 24
     PWR_PIN = 18
+    Flag = 0
 
     def __init__(self):
         import spidev
@@ -49,6 +170,8 @@ class RaspberryPi:
 
         self.GPIO = RPi.GPIO
         self.SPI = spidev.SpiDev()
+        self._spi_chunk = self.SPI_CHUNK
+        self._spi_overrides = {}
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -56,6 +179,9 @@ class RaspberryPi:
     def digital_read(self, pin):
         return self.GPIO.input(pin)
 
+    def digital_wait(self, pin, value, timeout_ms=BUSY_TIMEOUT_MS):
+        return _wait_for_level(self.GPIO, self.digital_read, pin, value, timeout_ms)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -63,23 +189,29 @@ class RaspberryPi:
         self.SPI.writebytes(data)
 
     def spi_writebyte2(self, data):
-        self.SPI.writebytes2(data)
+        for chunk in _byte_chunks(data, self._spi_chunk):
+            self.SPI.writebytes2(chunk)
 
-    def module_init(self):
-        self.GPIO.setmode(self.GPIO.BCM)
-        self.GPIO.setwarnings(False)
-        self.GPIO.setup(self.RST_PIN, self.GPIO.OUT)
-        self.GPIO.setup(self.DC_PIN, self.GPIO.OUT)
-        self.GPIO.setup(self.CS_PIN, self.GPIO.OUT)
-        self.GPIO.setup(self.PWR_PIN, self.GPIO.OUT)
-        self.GPIO.setup(self.BUSY_PIN, self.GPIO.IN)
+    def spi_write_commands(self, commands):
+        _write_commands(self, commands)
 
-        self.GPIO.output(self.PWR_PIN, 1)
+    def module_init(self, profile=None):
+        # the handles stay open between updates until module_exit
+        if self.Flag == 0:
+            self.Flag = 1
+            self.GPIO.setmode(self.GPIO.BCM)
+            self.GPIO.setwarnings(False)
+            self.GPIO.setup(self.RST_PIN, self.GPIO.OUT)
+            self.GPIO.setup(self.DC_PIN, self.GPIO.OUT)
+            self.GPIO.setup(self.CS_PIN, self.GPIO.OUT)
+            self.GPIO.setup(self.PWR_PIN, self.GPIO.OUT)
+            self.GPIO.setup(self.BUSY_PIN, self.GPIO.IN)
+
+            self.GPIO.output(self.PWR_PIN, 1)
 
-        # SPI device, bus = 0, device = 0
-        self.SPI.open(0, 0)
-        self.SPI.max_speed_hz = 4000000
-        self.SPI.mode = 0b00
+            # SPI device, bus = 0, device = 0
+            self.SPI.open(0, 0)
+        self._apply_spi_profile(profile)
         return 0
 
     def module_exit(self):
@@ -87,6 +219,7 @@ class RaspberryPi:
         self.SPI.close()
 
         logger.debug("close 5V, Module enters 0 power consumption ...")
+        self.Flag = 0
         self.GPIO.output(self.RST_PIN, 0)
         self.GPIO.output(self.DC_PIN, 0)
         self.GPIO.output(self.PWR_PIN, 0)
@@ -131,6 +264,9 @@ class JetsonNano:
     def digital_read(self, pin):
         return self.GPIO.input(self.BUSY_PIN)
 
+    def digital_wait(self, pin, value, timeout_ms=BUSY_TIMEOUT_MS):
+        return _wait_for_level(self.GPIO, self.digital_read, pin, value, timeout_ms)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -138,10 +274,17 @@ class JetsonNano:
         self.SPI.SYSFS_software_spi_transfer(data[0])
 
     def spi_writebyte2(self, data):
-        for i in range(len(data)):
-            self.SPI.SYSFS_software_spi_transfer(data[i])
+        for value in _byte_view(data):
+            self.SPI.SYSFS_software_spi_transfer(value)
+
+    def spi_profile(self, speed_hz=None, mode=None, chunk=None, validate=False):
+        # the software SPI runs as fast as the GPIO toggling allows
+        pass
+
+    def spi_write_commands(self, commands):
+        _write_commands(self, commands)
 
-    def module_init(self):
+    def module_init(self, profile=None):
         self.GPIO.setmode(self.GPIO.BCM)
         self.GPIO.setwarnings(False)
         self.GPIO.setup(self.RST_PIN, self.GPIO.OUT)
@@ -169,7 +312,7 @@ class JetsonNano:
         )
 
 
-class SunriseX3:
+class SunriseX3(_SpidevProfile):
     # Pin definition
     RST_PIN = 17
     DC_PIN = 25
@@ -184,6 +327,8 @@ class SunriseX3:
 
         self.GPIO = Hobot.GPIO
         self.SPI = spidev.SpiDev()
+        self._spi_chunk = self.SPI_CHUNK
+        self._spi_overrides = {}
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -191,6 +336,9 @@ class SunriseX3:
     def digital_read(self, pin):
         return self.GPIO.input(pin)
 
+    def digital_wait(self, pin, value, timeout_ms=BUSY_TIMEOUT_MS):
+        return _wait_for_level(self.GPIO, self.digital_read, pin, value, timeout_ms)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -200,9 +348,13 @@ class SunriseX3:
     def spi_writebyte2(self, data):
         # for i in range(len(data)):
         #     self.SPI.writebytes([data[i]])
-        self.SPI.xfer3(data)
+        for chunk in _byte_chunks(data, self._spi_chunk):
+            self.SPI.xfer3(chunk)
+
+    def spi_write_commands(self, commands):
+        _write_commands(self, commands)
 
-    def module_init(self):
+    def module_init(self, profile=None):
         if self.Flag == 0:
             self.Flag = 1
             self.GPIO.setmode(self.GPIO.BCM)
@@ -217,11 +369,8 @@ class SunriseX3:
 
             # SPI device, bus = 0, device = 0
             self.SPI.open(2, 0)
-            self.SPI.max_speed_hz = 4000000
-            self.SPI.mode = 0b00
-            return 0
-        else:
-            return 0
+        self._apply_spi_profile(profile)
+        return 0
 
     def module_exit(self):
         logger.debug("spi end")